@@ -11,6 +11,9 @@ setup(
         'aws-parallelcluster==2.6.1',  # AMI Filtering relies on this version
                                        # see vivarium_aws.configuration.ami
     ],
+    extras_require={
+        'test': ['pytest', 'moto'],
+    },
 
     entry_points="""
         [console_scripts]
@@ -0,0 +1,22 @@
+import boto3
+import pytest
+from moto import mock_aws
+
+
+@pytest.fixture
+def s3_bucket(monkeypatch):
+    """A bucket in a fake S3, with fake credentials so nothing reaches AWS."""
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+    with mock_aws():
+        boto3.client('s3').create_bucket(Bucket='results-bucket')
+        yield 'results-bucket'
+
+
+def upload_spool(bucket, spool, prefix):
+    """Upload a node's spool directory the way its cron sync would."""
+    client = boto3.client('s3')
+    for path in spool.iterdir():
+        if path.suffix != '.tmp':
+            client.upload_file(str(path), bucket, f"{prefix}/{path.name}")
@@ -0,0 +1,19 @@
+import pytest
+
+from vivarium_aws.configuration import cluster
+
+
+def test_warm_pool_keeps_nodes_and_outlasts_submission_gaps():
+    configuration = cluster.get_default_configuration('c')
+    cluster.apply_warm_pool(configuration, 'c', warm_pool_size=3, submission_interval=10.5)
+    assert configuration['cluster c']['initial_queue_size'] == '3'
+    assert configuration['cluster c']['maintain_initial_size'] == 'true'
+    assert configuration['scaling c']['scaledown_idletime'] == '13'
+
+
+@pytest.mark.parametrize('warm_pool_size, submission_interval', [(-2, None), (None, -10.), (-2, -10.)])
+def test_negative_warm_pool_settings_are_rejected(warm_pool_size, submission_interval):
+    configuration = cluster.get_default_configuration('c')
+    with pytest.raises(RuntimeError):
+        cluster.apply_warm_pool(configuration, 'c', warm_pool_size, submission_interval)
+    assert configuration['cluster c']['initial_queue_size'] == '1'
@@ -0,0 +1,78 @@
+import tarfile
+
+from vivarium_aws.configuration import ami, packaging
+
+# A package whose ignore files exercise anchored, directory-only, `**`,
+# negated and nested patterns. The expected manifest matches what
+# `git check-ignore` reports for the same tree.
+_files = {
+    '.gitignore': "/build\nlogs/\n**/cache/**\n*.pyc\n!keep.pyc\ndata/**/*.csv\n",
+    '.vawsignore': "notes.txt\n",
+    'setup.py': "",
+    'build': "a file, but anchored /build still matches it",
+    'notes.txt': "",
+    'keep.pyc': "",
+    'module.pyc': "",
+    'artifact.hdf': "",
+    'src/model/__init__.py': "",
+    'src/model/components.pyc': "",
+    'src/model/keep.pyc': "",
+    'src/model/build/output.py': "",
+    'src/model/logs': "a file, so the directory-only logs/ does not match",
+    'src/model/cache/stale.py': "",
+    'src/logs/run.log': "",
+    'src/model/.gitignore': "*.yaml\n!model_spec.yaml\n",
+    'src/model/model_spec.yaml': "",
+    'src/model/other_spec.yaml': "",
+    'src/model/data/raw/table.csv': "",
+    'data/raw/table.csv': "",
+    'data/table.csv': "",
+    'data/readme.md': "",
+    'results/keep.hdf': "",
+    'results/.gitignore': "!*.hdf\n",
+    '.git/HEAD': "",
+}
+
+_expected = {
+    '.gitignore', '.vawsignore', 'setup.py', 'keep.pyc', 'src', 'src/model', 'src/model/__init__.py',
+    'src/model/keep.pyc', 'src/model/build', 'src/model/build/output.py', 'src/model/logs',
+    'src/model/cache', 'src/model/.gitignore', 'src/model/model_spec.yaml', 'src/model/data',
+    'src/model/data/raw', 'src/model/data/raw/table.csv', 'data', 'data/raw', 'data/readme.md',
+    'results', 'results/keep.hdf', 'results/.gitignore', 'empty',
+}
+
+
+def make_package(root):
+    for path, contents in _files.items():
+        (root / path).parent.mkdir(parents=True, exist_ok=True)
+        (root / path).write_text(contents)
+    (root / 'empty').mkdir()
+    return root
+
+
+def test_manifest_follows_ignore_files(tmp_path):
+    root = make_package(tmp_path / 'package')
+    manifest = packaging.make_manifest(root)
+    assert {entry.path for entry in manifest} == _expected
+    assert {entry.path for entry in manifest if entry.is_dir} == {
+        'src', 'src/model', 'src/model/build', 'src/model/cache', 'src/model/data',
+        'src/model/data/raw', 'data', 'data/raw', 'results', 'empty'}
+
+
+def test_negation_does_not_reach_into_ignored_directories(tmp_path):
+    root = make_package(tmp_path / 'package')
+    ignore = packaging.IgnoreFilter(root)
+    assert ignore.is_ignored('src/logs', is_dir=True)
+    assert not ignore.is_ignored('src/logs', is_dir=False)
+    assert ignore.is_ignored('results/data.h5', is_dir=False)
+    assert not ignore.is_ignored('results/data.hdf', is_dir=False)
+
+
+def test_tarball_holds_the_copied_manifest(tmp_path):
+    root = make_package(tmp_path / 'package')
+    manifest = packaging.make_manifest(root)
+    packaging.copy_manifest(manifest, root, tmp_path / 'copy')
+    tar_path = ami.tar_vivarium_package(tmp_path / 'copy', tmp_path, archive_name='package')
+    with tarfile.open(tar_path) as tarball:
+        names = set(tarball.getnames())
+    assert names == {'package'} | {f'package/{path}' for path in _expected}
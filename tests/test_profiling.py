@@ -0,0 +1,107 @@
+import json
+import os
+import subprocess
+import sys
+import textwrap
+import types
+
+from vivarium_aws import profiling
+from vivarium_aws.node import profiler
+
+from conftest import upload_spool
+
+# A toy task queue worker. With `fork`, each job runs in a forked child that
+# leaves with os._exit, as rq workers run simulations. With `sequential`, the
+# jobs run one after another in the worker itself.
+_worker_script = textwrap.dedent("""
+    import os
+    import sys
+    import time
+
+    sys.path.insert(0, sys.argv[1])
+    import vaws_profiler
+    vaws_profiler.install()
+
+
+    def work_horse(seconds):
+        total, end = 0, time.time() + seconds
+        while time.time() < end:
+            total += sum(i * i for i in range(1000))
+        return total
+
+
+    def run_job(job_parameters):
+        work_horse(0.5)
+
+
+    for scenario in sys.argv[3:]:
+        job_parameters = {'branch_configuration': {'scenario': scenario}, 'random_seed': 0}
+        if sys.argv[2] == 'sequential':
+            run_job(job_parameters)
+            continue
+        pid = os.fork()
+        if pid == 0:
+            run_job(job_parameters)
+            os._exit(0)
+        os.waitpid(pid, 0)
+""")
+
+
+def run_worker(tmp_path, mode, scenarios):
+    spool = tmp_path / 'spool'
+    spool.mkdir()
+    config_path = tmp_path / 'profiler.conf'
+    config_path.write_text(f"interval=0.005\nspool={spool}\n")
+    module_dir = tmp_path / 'site-packages'
+    module_dir.mkdir()
+    (module_dir / 'vaws_profiler.py').write_text(profiling.get_profiler_source())
+
+    subprocess.run([sys.executable, '-c', _worker_script, str(module_dir), mode, *scenarios], check=True,
+                   env=dict(os.environ, VAWS_PROFILER_CONFIG=str(config_path)), timeout=60)
+    return spool
+
+
+def test_forked_jobs_are_profiled_by_branch(tmp_path, s3_bucket):
+    spool = run_worker(tmp_path, 'fork', ['baseline', 'intervention'])
+    profiles = list(spool.glob('*.json.gz'))
+    assert len(profiles) >= 2  # one per job, plus the worker if it was sampled
+    assert len({path.name for path in profiles}) == len(profiles)
+
+    upload_spool(s3_bucket, spool, profiling.get_profile_prefix('test-cluster'))
+    paths = profiling.download_profiles(s3_bucket, 'test-cluster', tmp_path / 'downloaded')
+    merged = profiling.merge_profiles(paths)
+
+    for scenario in ['baseline', 'intervention']:
+        branch = json.dumps({'scenario': scenario}, sort_keys=True)
+        assert branch in merged
+        hot_functions = [hot.function for hot in profiling.get_hot_functions(merged[branch])]
+        assert any(function.startswith('work_horse ') for function in hot_functions)
+
+    output_path = tmp_path / 'report'
+    profiling.write_report(merged, output_path)
+    branches = json.loads((output_path / 'branches.json').read_text())
+    assert set(branches.values()) >= {'all branches', json.dumps({'scenario': 'baseline'}, sort_keys=True)}
+    assert 'work_horse' in (output_path / 'all_hot_functions.tsv').read_text()
+    assert (output_path / 'all.folded').read_text().strip()
+
+
+def test_sequential_jobs_are_profiled_by_branch(tmp_path):
+    spool = run_worker(tmp_path, 'sequential', ['a', 'b', 'c'])
+    merged = profiling.merge_profiles(list(spool.glob('*.json.gz')))
+
+    for scenario in ['a', 'b', 'c']:
+        stacks = merged[json.dumps({'scenario': scenario}, sort_keys=True)]
+        # each half second job gets a fair share of the samples
+        assert sum(stacks.values()) > 0.2 * sum(profiling.combine_branches(merged).values())
+
+
+def test_branch_label_is_cached_without_holding_the_frame():
+    sampler = profiler.Sampler(0, dict(profiler._default_config))
+
+    def run_job(job_parameters):
+        return sampler.get_branch(sys._getframe())
+
+    # The frames of consecutive calls are often reused at the same address
+    assert [run_job({'branch_configuration': {'scenario': scenario}}) for scenario in 'abc'] == [
+        json.dumps({'scenario': scenario}) for scenario in 'abc']
+    assert not any(isinstance(value, types.FrameType) for value in vars(sampler).values())
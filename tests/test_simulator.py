@@ -0,0 +1,30 @@
+import pytest
+
+from vivarium_aws import simulator
+
+_settings = simulator.ClusterSettings(compute_instance_type='c5.large', master_instance_type='t2.micro',
+                                      initial_queue_size=1, max_queue_size=10, maintain_initial_size=True,
+                                      scaledown_idletime=5, slots_per_node=2)
+
+
+def test_all_jobs_finish():
+    runtime = simulator.parse_runtime_distribution('fixed:30')
+    result = simulator.simulate(_settings, 40, runtime, boot_time=6., seed=0)
+    assert result.peak_nodes == 10
+    # 40 half-hour jobs on at most 20 slots take at least an hour
+    assert 1. <= result.makespan < 2.
+    assert 0 < result.utilization <= 1
+
+
+@pytest.mark.parametrize('spec', ['fixed:0', 'exponential:0', 'lognormal:0,5', 'normal:30,-1',
+                                  'uniform:10,5', 'gamma:1', 'fixed'])
+def test_invalid_runtime_distributions_are_rejected(spec):
+    with pytest.raises(ValueError):
+        simulator.parse_runtime_distribution(spec)
+
+
+@pytest.mark.parametrize('num_jobs, boot_time, replications', [(0, 6., 1), (-5, 6., 1), (10, -3., 1), (10, 6., 0)])
+def test_invalid_simulation_inputs_are_rejected(num_jobs, boot_time, replications):
+    runtime = simulator.parse_runtime_distribution('fixed:30')
+    with pytest.raises(ValueError):
+        simulator.simulate_expected(_settings, num_jobs, runtime, boot_time, replications)
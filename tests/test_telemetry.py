@@ -0,0 +1,100 @@
+import types
+
+import pytest
+
+from vivarium_aws import telemetry
+from vivarium_aws.node import telemetry as node_telemetry
+
+from conftest import upload_spool
+
+
+def write_proc(proc, user, idle, memory_available_kib, rss_kib, disk_sectors, network_bytes):
+    """Write the parts of /proc the sampler reads for a two vCPU node."""
+    (proc / 'stat').write_text(f"cpu  {user} 0 100 {idle} 10 0 0 0 0 0\n"
+                               f"cpu0 {user // 2} 0 50 {idle // 2} 5 0 0 0 0 0\n"
+                               f"cpu1 {user // 2} 0 50 {idle // 2} 5 0 0 0 0 0\n"
+                               "intr 0\n")
+    (proc / 'meminfo').write_text(f"MemTotal:        8388608 kB\n"
+                                  f"MemFree:          100000 kB\n"
+                                  f"MemAvailable:    {memory_available_kib} kB\n")
+    (proc / 'diskstats').write_text(f"   7       0 loop0 1 0 999 0 1 0 999 0 0 0 0\n"
+                                    f" 202       0 xvda 10 0 {disk_sectors} 0 10 0 {disk_sectors} 0 0 0 0\n"
+                                    f" 202       1 xvda1 10 0 {disk_sectors} 0 10 0 {disk_sectors} 0 0 0 0\n")
+    (proc / 'net').mkdir(exist_ok=True)
+    (proc / 'net' / 'dev').write_text(
+        "Inter-|   Receive                                                |  Transmit\n"
+        " face |bytes    packets errs drop fifo frame compressed multicast|bytes    packets\n"
+        f"    lo: 999 0 0 0 0 0 0 0 999 0 0 0 0 0 0 0\n"
+        f"  eth0: {network_bytes} 0 0 0 0 0 0 0 {network_bytes} 0 0 0 0 0 0 0\n")
+    (proc / '4242').mkdir(exist_ok=True)
+    (proc / '4242' / 'status').write_text(f"Name:\tpython\nVmRSS:\t{rss_kib} kB\n")
+
+
+@pytest.fixture
+def node(tmp_path, monkeypatch):
+    proc = tmp_path / 'proc'
+    proc.mkdir()
+    slots = tmp_path / 'slots'
+    qstat = tmp_path / 'qstat'
+    qstat.write_text(f"#!/bin/sh\necho 'queuename qtype resv/used/tot. load_avg arch states'\n"
+                     f"echo \"all.q@$(hostname) BIP $(cat {slots}) 0.01 lx-amd64\"\n")
+    qstat.chmod(0o755)
+
+    clock = [3600. * 1000]
+    monkeypatch.setattr(node_telemetry, 'time', types.SimpleNamespace(time=lambda: clock[0]))
+    config = dict(node_telemetry._default_config, proc=str(proc), qstat=str(qstat),
+                  spool=str(tmp_path / 'spool'), metadata_url='http://127.0.0.1:9')
+    return types.SimpleNamespace(proc=proc, slots=slots, clock=clock, config=config)
+
+
+def test_samples_round_trip_to_job_demand(node, s3_bucket, tmp_path):
+    write_proc(node.proc, user=1000, idle=10000, memory_available_kib=8388608 - 1024 * 1000,
+               rss_kib=1024 * 100, disk_sectors=0, network_bytes=0)
+    sampler = node_telemetry.Sampler(node.config)
+    assert sampler.vcpus == 2
+    assert sampler.name.startswith(sampler.hostname + '.')
+    assert sampler.sample() is None
+
+    rows = []
+    # An idle interval, then one with both slots running jobs that keep the
+    # CPUs 90% busy and use 1000MiB each.
+    for used, user, idle, available in [(0, 1020, 10180, 1000), (2, 1200, 10200, 3000)]:
+        node.slots.write_text(f"0/{used}/2")
+        node.clock[0] += 15
+        write_proc(node.proc, user=user, idle=idle, memory_available_kib=8388608 - 1024 * available,
+                   rss_kib=1024 * 900, disk_sectors=2000 * used, network_bytes=10 ** 6 * used)
+        rows.append(sampler.sample())
+
+    spool = tmp_path / 'spool'
+    spool.mkdir()
+    start = rows[0][0] - rows[0][0] % 3600
+    node_telemetry.write_chunk(str(spool), sampler.name, start, rows)
+    upload_spool(s3_bucket, spool, telemetry.get_telemetry_prefix('test-cluster'))
+
+    paths = telemetry.download_telemetry(s3_bucket, 'test-cluster', tmp_path / 'downloaded')
+    samples = telemetry.load_samples(paths)
+    assert list(samples) == [sampler.name]
+    assert [row['slots_used'] for row in samples[sampler.name]] == [0, 2]
+
+    demand = telemetry.estimate_job_demand(samples)
+    assert demand.vcpus == pytest.approx(0.9)
+    assert demand.memory_mib == pytest.approx(1000)
+    assert demand.bottleneck == 'cpu'
+
+
+def test_unreachable_qstat_leaves_slots_blank(tmp_path):
+    qstat = tmp_path / 'qstat'
+    qstat.write_text("#!/bin/sh\nsleep 5\n")
+    qstat.chmod(0o755)
+    assert node_telemetry.read_slots(str(qstat), 'host', timeout=0.1) == ('', '')
+
+
+def test_burstable_instances_are_credited_their_baseline():
+    demand = telemetry.JobDemand(vcpus=1., memory_mib=500., iowait=0., bottleneck='cpu')
+    slots = {r.instance_type: r.slots for r in telemetry.recommend_instances(demand, count=100)}
+    assert 't3.large' not in slots  # 2 vCPUs at a 30% baseline cannot sustain one job
+    assert slots['c5.xlarge'] == 4
+
+    light_demand = demand._replace(vcpus=0.01)
+    slots = {r.instance_type: r.slots for r in telemetry.recommend_instances(light_demand, count=100)}
+    assert slots['c5.xlarge'] == 4  # never more jobs than vCPUs
@@ -6,8 +6,8 @@ from pathlib import Path
 import click
 from loguru import logger
 
-from vivarium_aws.configuration import ami, cluster
-from vivarium_aws import utilities
+from vivarium_aws.configuration import ami, cluster, storage
+from vivarium_aws import fleet, profiling, simulator, telemetry, utilities
 
 
 @click.group()
@@ -34,6 +34,32 @@ def configure():
     pass
 
 
+@vaws.group('cluster')
+def cluster_group():
+    """Adjust a running cluster.
+
+    Most administration is best done with `pcluster` directly. These
+    commands cover Vivarium-specific needs that it lacks.
+    """
+    pass
+
+
+@vaws.group('profile')
+def profile():
+    """Inspect profiles recorded on a cluster configured with
+    `vaws configure cluster --profile-simulations`.
+    """
+    pass
+
+
+@vaws.group('telemetry')
+def telemetry_group():
+    """Inspect utilization recorded on a cluster configured with
+    `vaws configure cluster --record-telemetry`.
+    """
+    pass
+
+
 @vaws.group('make')
 def make():
     """Provision cloud resources from configuration files.
@@ -116,6 +142,37 @@ def configure_ami(ami_name, code_root, output_path, artifact_path, region):
                    "setting this equal to the total number of simulations your "
                    "branches file describes - Your compute hours are the same "
                    "no matter the degree of parallelism.")
+@click.option("--storage-profile", default='default', type=click.Choice(storage.get_storage_profile_names()),
+              help="Volume settings for the master and compute nodes. `provisioned-iops` "
+                   "adds a provisioned-IOPS volume at /shared on the master for collecting "
+                   "results and requires an EBS-optimized master. `shared-scratch` adds a "
+                   "throughput-optimized volume at /shared_scratch. `instance-store` mounts "
+                   "NVMe instance storage at /scratch and requires a compute instance that "
+                   "has it, such as c5d.large. Defaults to the aws-parallelcluster defaults.")
+@click.option("--volume-size", default=None, type=click.INT,
+              help="The size in GB of the storage profile's shared volume.")
+@click.option("--volume-iops", default=None, type=click.INT,
+              help="The provisioned IOPS of the storage profile's shared volume.")
+@click.option("--profile-simulations", is_flag=True,
+              help="Install a sampling profiler on every node that records the simulation "
+                   "processes and syncs compressed profiles to S3_BUCKET. Summarize them "
+                   "with `vaws profile report`.")
+@click.option("--profile-interval", default=0.01, type=click.FLOAT,
+              help="Seconds between profiler samples. Defaults to 0.01.")
+@click.option("--warm-pool-size", default=None, type=click.IntRange(min=0),
+              help="The number of compute instances kept running at all times, so that "
+                   "bursts of submissions start without waiting for instances to boot. "
+                   "Defaults to 1. Use `vaws cluster warm` to raise it temporarily.")
+@click.option("--submission-interval", default=None, type=click.FloatRange(min=0),
+              help="The expected minutes between batches of submissions. Idle compute "
+                   "instances are kept alive slightly longer than this so the next batch "
+                   "can use them. Defaults to scaling down after 5 idle minutes.")
+@click.option("--record-telemetry", is_flag=True,
+              help="Run a sampler on every node that records CPU, memory, disk, network "
+                   "and SGE slot usage and syncs it to S3_BUCKET. Turn it into instance "
+                   "recommendations with `vaws telemetry summarize`.")
+@click.option("--telemetry-interval", default=15., type=click.FLOAT,
+              help="Seconds between telemetry samples. Defaults to 15.")
 def configure_cluster(cluster_name: str,
                       ami_id: str,
                       s3_bucket: str,
@@ -126,7 +183,16 @@ def configure_cluster(cluster_name: str,
                       ec2_keypair: str,
                       master_instance: str,
                       compute_instance: int,
-                      max_queue_size: str):
+                      max_queue_size: str,
+                      storage_profile: str,
+                      volume_size: int,
+                      volume_iops: int,
+                      profile_simulations: bool,
+                      profile_interval: float,
+                      warm_pool_size: int,
+                      submission_interval: float,
+                      record_telemetry: bool,
+                      telemetry_interval: float):
     """Generate an aws-parallelcluster configuration describing a cluster ready
     to run Vivarium simulations.
 
@@ -151,7 +217,7 @@ def configure_cluster(cluster_name: str,
     utilities.ensure_aws_credentials_exist()
 
     region = utilities.get_default_region() if region is None else region
-    utilities.ensure_ami_exists(region, ami_id)
+    ami_volume_size = utilities.get_root_volume_size(utilities.ensure_ami_exists(region, ami_id))
     vpc_id = utilities.get_default_vpc(region) if vpc_id is None else vpc_id
     master_subnet_id = utilities.get_default_subnet_id(region, vpc_id) if master_subnet_id is None else master_subnet_id
     ec2_keypair = utilities.prompt_for_ec2_keypair(region) if ec2_keypair is None else ec2_keypair
@@ -160,7 +226,12 @@ def configure_cluster(cluster_name: str,
 
     cluster.make_configuration(cluster_name, ami_id, s3_bucket, output_root,
                                region, vpc_id, master_subnet_id, ec2_keypair,
-                               master_instance, compute_instance, max_queue_size)
+                               master_instance, compute_instance, max_queue_size,
+                               storage_profile, volume_size, volume_iops,
+                               profile_simulations, profile_interval,
+                               warm_pool_size, submission_interval,
+                               record_telemetry, telemetry_interval,
+                               ami_volume_size)
 
 
 # ########################
@@ -232,3 +303,204 @@ def make_cluster(cluster_config: str, cluster_name: str):
         proc.send_signal(signal.SIGINT)
     if ret:
         logger.error(f"Failed to bootstrap the cluster. The process exited with {ret}.")
+
+
+# ########################
+#
+# Planning Commands
+#
+# ########################
+
+
+@vaws.command('simulate-cluster')
+@click.argument('cluster_config', type=click.Path(dir_okay=False, exists=True))
+@click.option('-n', '--num-jobs', required=True, type=click.IntRange(min=1),
+              help="The number of simulation jobs submitted at once.")
+@click.option('-r', '--runtime', default='normal:30,5', type=click.STRING,
+              help="The distribution of job runtimes in minutes, given as `fixed:MINUTES`, "
+                   "`uniform:LOW,HIGH`, `normal:MEAN,SD`, `lognormal:MEAN,SD` or "
+                   "`exponential:MEAN`. Defaults to normal:30,5.")
+@click.option('--boot-time', default=6., type=click.FloatRange(min=0),
+              help="Minutes from a scale-up request until a new node accepts jobs.")
+@click.option('--replications', default=20, type=click.IntRange(min=1),
+              help="The number of simulations averaged for each configuration.")
+@click.option('--seed', default=0, type=click.INT, help="The random seed.")
+@click.option('--max-queue-size', multiple=True, type=click.IntRange(min=1),
+              help="Override max_queue_size. Can be given multiple times to sweep values.")
+@click.option('--scaledown-idletime', multiple=True, type=click.FloatRange(min=0),
+              help="Override scaledown_idletime in minutes. Can be given multiple times to "
+                   "sweep values.")
+@click.option('--compute-instance', multiple=True, type=click.STRING,
+              help="Override compute_instance_type. Can be given multiple times to sweep values.")
+@click.option('--sort-by', default='cost', type=click.Choice(['cost', 'makespan', 'node-hours']),
+              help="The column to rank swept configurations by.")
+def simulate_cluster(cluster_config: str, num_jobs: int, runtime: str, boot_time: float,
+                     replications: int, seed: int, max_queue_size: tuple,
+                     scaledown_idletime: tuple, compute_instance: tuple, sort_by: str):
+    """Estimate the makespan, node-hours and cost of running NUM_JOBS jobs on
+    the cluster described by CLUSTER_CONFIG, without launching anything.
+
+    This runs an offline discrete-event simulation of the aws-parallelcluster
+    SGE autoscaler, modeling node boot latency, slot packing, scale-up polling
+    and idle scale-down. Give any of the override options multiple times to
+    compare every combination of settings and pick one before making the
+    cluster.
+    """
+    settings = simulator.read_cluster_settings(Path(cluster_config))
+    try:
+        runtime_distribution = simulator.parse_runtime_distribution(runtime)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint='--runtime')
+
+    try:
+        results = simulator.sweep(settings, num_jobs, runtime_distribution, boot_time, replications, seed,
+                                  max_queue_sizes=list(max_queue_size),
+                                  scaledown_idletimes=list(scaledown_idletime),
+                                  compute_instance_types=list(compute_instance))
+    except ValueError as e:
+        raise click.ClickException(str(e))
+
+    sort_key = {'cost': 'cost', 'makespan': 'makespan', 'node-hours': 'node_hours'}[sort_by]
+    results = sorted(results, key=lambda pair: getattr(pair[1], sort_key))
+
+    click.echo(f"{'instance':<12} {'max queue':>9} {'idle (min)':>10} {'makespan (h)':>12} "
+               f"{'node-hours':>10} {'utilization':>11} {'peak nodes':>10} {'cost ($)':>9}")
+    for candidate, result in results:
+        click.echo(f"{candidate.compute_instance_type:<12} {candidate.max_queue_size:>9} "
+                   f"{candidate.scaledown_idletime:>10g} {result.makespan:>12.2f} "
+                   f"{result.node_hours:>10.2f} {result.utilization:>11.1%} "
+                   f"{result.peak_nodes:>10.1f} {result.cost:>9.2f}")
+
+
+# ########################
+#
+# Profile Commands
+#
+# ########################
+
+
+@profile.command('report')
+@click.argument('s3_bucket', type=click.STRING)
+@click.argument('cluster_name', type=click.STRING)
+@click.option('-o', '--output-root', type=click.Path(file_okay=False, exists=False),
+              help="The output directory to place the report folder in. Defaults to the "
+                   "current directory.")
+@click.option('-n', '--count', default=20, type=click.INT,
+              help="The number of functions in each hot function table.")
+@click.option('--endpoint-url', default=None, type=click.STRING,
+              help="An S3-compatible endpoint to use instead of AWS, for example a local "
+                   "fake for testing.")
+def profile_report(s3_bucket: str, cluster_name: str, output_root: str, count: int, endpoint_url: str):
+    """Download the simulation profiles that CLUSTER_NAME's nodes synced to
+    S3_BUCKET and merge them into hot function tables and flamegraph data,
+    overall and by branch.
+
+    The report folder holds a `.folded` collapsed stack file per branch,
+    readable by flamegraph.pl or speedscope, a matching hot function table,
+    and `branches.json` mapping file names to branch configurations. The hot
+    functions across all branches are also printed.
+    """
+    if endpoint_url is None:
+        utilities.ensure_aws_credentials_exist()
+
+    output_root = Path(output_root) if output_root else Path(".").resolve()
+    output_path = output_root / f"{cluster_name}_profile_report"
+
+    paths = profiling.download_profiles(s3_bucket, cluster_name, output_path / "raw", endpoint_url)
+    merged = profiling.merge_profiles(paths)
+    profiling.write_report(merged, output_path, count)
+
+    combined = profiling.combine_branches(merged)
+    total = sum(combined.values())
+    click.echo(f"{len(merged)} branches, {total} samples. Hot functions across all branches:")
+    click.echo(f"{'self':>7} {'total':>7}  function")
+    for hot in profiling.get_hot_functions(combined, count):
+        click.echo(f"{hot.self_samples / total:>7.1%} {hot.total_samples / total:>7.1%}  {hot.function}")
+
+
+# ########################
+#
+# Cluster Commands
+#
+# ########################
+
+
+@cluster_group.command('warm')
+@click.argument('cluster_name', type=click.STRING)
+@click.argument('nodes', required=False, type=click.IntRange(min=1))
+@click.option('--release', is_flag=True,
+              help="Restore the configured floor instead of raising it.")
+@click.option('--region', default=None,
+              help="The region the cluster runs in. Defaults to the default region "
+                   "specified with your credentials.")
+def warm_cluster(cluster_name: str, nodes: int, release: bool, region: str):
+    """Start NODES compute instances in CLUSTER_NAME now and keep them
+    running, ahead of a known batch of submissions.
+
+    The raised floor lasts until `vaws cluster warm CLUSTER_NAME --release`,
+    after which the extra instances scale down once idle.
+    """
+    utilities.ensure_aws_credentials_exist()
+    region = utilities.get_default_region() if region is None else region
+
+    if release:
+        fleet.release_compute_fleet(region, cluster_name)
+    elif nodes is None:
+        raise click.UsageError("Give the number of NODES to warm, or --release.")
+    else:
+        fleet.warm_compute_fleet(region, cluster_name, nodes)
+
+
+# ########################
+#
+# Telemetry Commands
+#
+# ########################
+
+
+@telemetry_group.command('summarize')
+@click.argument('s3_bucket', type=click.STRING)
+@click.argument('cluster_name', type=click.STRING)
+@click.option('-o', '--output-root', type=click.Path(file_okay=False, exists=False),
+              help="The output directory to download telemetry into. Defaults to the "
+                   "current directory.")
+@click.option('-n', '--count', default=5, type=click.INT,
+              help="The number of instance types to recommend.")
+@click.option('--endpoint-url', default=None, type=click.STRING,
+              help="An S3-compatible endpoint to use instead of AWS, for example a local "
+                   "fake for testing.")
+def summarize_telemetry(s3_bucket: str, cluster_name: str, output_root: str, count: int, endpoint_url: str):
+    """Summarize the node utilization that CLUSTER_NAME's nodes synced to
+    S3_BUCKET and recommend compute instance types and slot counts.
+
+    Each job's CPU and memory needs are estimated from samples taken while
+    jobs were running. Instance types are then ranked by cost per job slot,
+    where an instance runs as many jobs as its vCPUs and memory allow. Note
+    that aws-parallelcluster gives each node one SGE slot per vCPU, so an
+    instance with fewer recommended slots than vCPUs will be oversubscribed
+    unless its slots are lowered.
+    """
+    if endpoint_url is None:
+        utilities.ensure_aws_credentials_exist()
+
+    output_root = Path(output_root) if output_root else Path(".").resolve()
+    output_path = output_root / f"{cluster_name}_telemetry"
+
+    paths = telemetry.download_telemetry(s3_bucket, cluster_name, output_path, endpoint_url)
+    samples = telemetry.load_samples(paths)
+
+    click.echo(f"{'host':<24} {'vcpus':>5} {'cpu p95':>7} {'iowait':>6} {'mem p95 (mib)':>13} "
+               f"{'disk p95 (mb/s)':>15} {'net p95 (mb/s)':>14} {'slots':>9}")
+    for node in telemetry.summarize_nodes(samples):
+        click.echo(f"{node.host:<24} {node.vcpus:>5} {node.cpu_busy_p95:>7.0%} {node.cpu_iowait_mean:>6.0%} "
+                   f"{node.memory_used_p95_mib:>6.0f}/{node.memory_total_mib:<6.0f} {node.disk_mbps_p95:>15.1f} "
+                   f"{node.network_mbps_p95:>14.1f} {node.slots_used_mean:>4.1f}/{node.slots_total:<4}")
+
+    demand = telemetry.estimate_job_demand(samples)
+    click.echo(f"\nEach job needs about {demand.vcpus:.2f} vCPUs and {demand.memory_mib:.0f}MiB. "
+               f"Bottleneck: {demand.bottleneck}.")
+
+    click.echo(f"\n{'compute_instance_type':<22} {'slots':>5} {'$/hour':>7} {'$/slot-hour':>11}")
+    for recommendation in telemetry.recommend_instances(demand, count):
+        click.echo(f"{recommendation.instance_type:<22} {recommendation.slots:>5} "
+                   f"{recommendation.hourly_cost:>7.4f} {recommendation.cost_per_slot_hour:>11.4f}")
@@ -1,20 +1,31 @@
-import warnings
 import json
+import math
 import tarfile
 import yaml
-import shutil
 import os.path
 import tempfile
 from pathlib import Path
 
-import boto3
-from botocore.exceptions import ClientError
 from loguru import logger
 
+from vivarium_aws import instances
+from vivarium_aws.configuration import packaging
 
-_general_purpose_instance_types = ["t2.nano", "t2.micro", "t2.small",
-                                   "t2.medium", "t2.large", "t2.xlarge",
-                                   "t2.2xlarge"]
+
+_builder_instance_types = ["t2.small", "t2.medium", "t2.large",
+                           "t3.small", "t3.medium", "t3.large",
+                           "m5.large", "m5.xlarge", "m5.2xlarge", "m5.4xlarge",
+                           "c5.large", "c5.xlarge", "c5.2xlarge", "c5.4xlarge"]
+
+_builder_minimum_memory_mib = 2048  # enough for conda to solve the environment
+_builder_target_transfer_minutes = 5
+
+# Root volume sizing for the builder. The aws-parallelcluster base AMI has a
+# 25GB root volume, roughly half of which is used before provisioning.
+_base_ami_volume_gb = 25
+_base_ami_used_gb = 12
+_environment_size_gb = 6  # miniconda, the simulation environment and apt packages
+_volume_headroom = 1.25
 
 _base_configuration = {
     "variables": {
@@ -84,6 +95,7 @@ sudo mkdir -p /usr/local/share/vivarium/artifacts
 sudo mv {temp_artifact_locations} /usr/local/share/vivarium/artifacts || true
 
 sudo tar -xvzf /tmp/code.tar.gz --directory $HOME
+sudo chown -R ubuntu:ubuntu $HOME/{package_name}
 cd $HOME/{package_name}
 sudo -u ubuntu $HOME/miniconda3/envs/simulation/bin/pip install -e .
 
@@ -105,10 +117,12 @@ def make_configuration(ami_name: str, code_root: Path, output_root: Path,
 
     package_name = code_root.name
 
-    # This process overwrites configuration so we operate on a copy
+    # This process overwrites configuration so we operate on a copy holding
+    # only the packaged files, which is then archived whole
+    manifest = packaging.make_manifest(code_root)
     tempdir = tempfile.TemporaryDirectory()
     tempdir_path = Path(tempdir.name) / 'vaws_configuration'
-    shutil.copytree(code_root, tempdir_path, ignore=shutil.ignore_patterns('*.hdf', '*.h5'))
+    packaging.copy_manifest(manifest, code_root, tempdir_path)
     code_root = tempdir_path
 
     if not artifact_paths:
@@ -121,10 +135,14 @@ def make_configuration(ami_name: str, code_root: Path, output_root: Path,
 
     configuration = _base_configuration
 
+    builder_instance = determine_correct_instance(ami_size_estimate)
+
     ami_builder = _ami_builder
     ami_builder['region'] = region
-    ami_builder['instance_type'] = determine_correct_instance(ami_size_estimate)
+    ami_builder['instance_type'] = builder_instance
     ami_builder['ami_name'] = f"{ami_name} {{{{timestamp}}}}"  # AMI names must be unique
+    ami_builder['launch_block_device_mappings'] = make_launch_block_device_mappings(ami_size_estimate,
+                                                                                    builder_instance)
 
     configuration['builders'].append(ami_builder)
 
@@ -132,6 +150,8 @@ def make_configuration(ami_name: str, code_root: Path, output_root: Path,
     configuration['provisioners'].extend(make_artifact_provisioners(artifact_paths))
     configuration['provisioners'].append(_environment_provisioner)
 
+    packaging.write_manifest(manifest, output_path / "code_manifest.txt")
+    packaging.log_size_report(manifest)
     tar_vivarium_package(code_root, output_path, archive_name=package_name)
 
     with open(output_path / f"provision_environment.sh", "w") as f:
@@ -205,49 +225,67 @@ def get_ami_size_estimate_mib(artifacts: list) -> int:
     return size / 1.e6
 
 
+def estimate_transfer_minutes(size_mb: float, instance: instances.InstanceType) -> float:
+    """Estimate the minutes an instance needs to receive `size_mb` of data over
+    the network and write it to its EBS root volume.
+    """
+    throughput_mbps = min(instance.network_gbps * 125, instance.ebs_throughput_mbps)  # in MB/s
+    return size_mb / throughput_mbps / 60
+
+
 def determine_correct_instance(ami_size_estimate_mb: int) -> str:
-    """Determine the smallest instance type that can safely hold the estiamted
-    artifact data size, with affordance for overhead.
+    """Determine the cheapest builder instance that can receive the estimated
+    artifact data within the target transfer time, based on its baseline
+    network bandwidth and EBS throughput. If no instance is fast enough, the
+    fastest is chosen.
     """
-    ami_size_estimate_mb += 4096  # overhead for the aws-parallelcluster base AMI
+    candidates = [instances.get_instance_type(name) for name in _builder_instance_types]
+    candidates = [c for c in candidates if c.memory_mib >= _builder_minimum_memory_mib]
 
-    client = boto3.client('ec2')
-    try:
-        instance_options = client.describe_instance_types(InstanceTypes=_general_purpose_instance_types)["InstanceTypes"]
-    except ClientError as e:
-        logger.error(e)
-        raise
+    fast_enough = [c for c in candidates
+                   if estimate_transfer_minutes(ami_size_estimate_mb, c) <= _builder_target_transfer_minutes]
+    if fast_enough:
+        correct_instance = min(fast_enough, key=lambda c: c.hourly_cost)
+    else:
+        correct_instance = min(candidates, key=lambda c: (estimate_transfer_minutes(ami_size_estimate_mb, c),
+                                                          c.hourly_cost))
 
-    correct_instance = None
-    for instance in sorted(instance_options, key=lambda instance: instance['MemoryInfo']['SizeInMiB']):
-        if instance['MemoryInfo']['SizeInMiB'] > ami_size_estimate_mb:
-            correct_instance = instance['InstanceType']
-            break
-    if correct_instance is None:
-        warnings.warn(f"vaws only supports building AMIs on relatively inexpensive, general-purpose t2 instances. "
-                      "The image y  ou are trying to pack is {ami_size_estimate_mb}mb, most likely due to artifacts, "
-                      "and this is larger than the largest general-purpose t2 instance available. Please review ec2 "
-                      "instance options and manually select and insert one into the machine configuration file.")
-    return correct_instance
+    logger.info(f"Building the AMI on a {correct_instance.name}, which should receive "
+                f"{ami_size_estimate_mb:.0f}mb of artifacts in about "
+                f"{estimate_transfer_minutes(ami_size_estimate_mb, correct_instance):.1f} minutes.")
+    return correct_instance.name
 
 
+def make_launch_block_device_mappings(ami_size_estimate_mb: int, instance_type: str) -> list:
+    """Construct the Packer root volume mapping for the builder, sized to hold
+    the base AMI, the environment and the artifacts with some headroom. The
+    gp3 volume is given as much throughput as the instance can use.
+    """
+    required_gb = _base_ami_used_gb + _environment_size_gb + ami_size_estimate_mb / 1.e3
+    volume_size = max(_base_ami_volume_gb, math.ceil(required_gb * _volume_headroom))
+    if volume_size > _base_ami_volume_gb:
+        logger.warning(f"The AMI root volume will be {volume_size}GB. `vaws configure cluster` "
+                       "raises the master and compute root volume sizes to match.")
 
-def tar_exclude_hdf(fname: str) -> bool:
-    """An hdf file exclusion function for use with tarball.add()."""
+    instance = instances.get_instance_type(instance_type)
+    throughput = int(min(1000, max(125, instance.ebs_throughput_mbps)))  # gp3 limits in MB/s
 
-    if fname.endswith('.hdf') or fname.endswith('.h5'):
-        return True
-    if '.git' in fname:
-        return True
-    return False
+    return [{
+        "device_name": "/dev/sda1",
+        "volume_size": volume_size,
+        "volume_type": "gp3",
+        "iops": 3000,
+        "throughput": throughput,
+        "delete_on_termination": True
+    }]
 
 
 def tar_vivarium_package(source: Path, target: Path, archive_name: str) -> str:
     """Create a tarball at `target` containing the Vivarium package located at
-    `source`, excluding its artifact data.
+    `source`, which must already hold only the packaged files.
     """
 
     tar_path = target / "code.tar.gz"
     with tarfile.open(tar_path, 'w:gz') as tarball:
-        tarball.add(str(source), arcname=archive_name, exclude=tar_exclude_hdf)
+        tarball.add(str(source), arcname=archive_name)
     return tar_path
@@ -1,3 +1,4 @@
+import math
 from configparser import ConfigParser
 from tempfile import TemporaryFile
 
@@ -5,6 +6,18 @@ import boto3
 from botocore.exceptions import ClientError
 from loguru import logger
 
+from vivarium_aws import profiling, telemetry
+from vivarium_aws.configuration import storage
+
+
+# Warm pool scale-down is tuned to outlast the gap between submissions by a
+# couple of nodewatcher polls. Beyond an hour, paying for idle nodes costs
+# more than the boot time it saves, so the default is kept.
+_idletime_margin_minutes = 2
+_max_warm_idletime_minutes = 60
+
+# The aws-parallelcluster 2.6.1 default for master and compute root volumes.
+_default_root_volume_size_gb = 25
 
 _post_install_script = """
 #!/bin/bash
@@ -38,9 +51,10 @@ def get_default_configuration(cluster_name: str) -> ConfigParser:
         'max_queue_size': 50,
         'maintain_initial_size': 'true',
         'vpc_settings': cluster_name,
+        'scaling_settings': cluster_name,
     }
 
-    config['scaling'] = {'scaledown_idletime': 5}
+    config[f'scaling {cluster_name}'] = {'scaledown_idletime': 5}
 
     config[f'vpc {cluster_name}'] = {
         'use_public_ips': 'true'
@@ -59,14 +73,38 @@ def make_configuration(cluster_name: str,
                        ec2_keypair: str,
                        master_instance: str,
                        compute_instance: int,
-                       max_queue_size: str):
+                       max_queue_size: str,
+                       storage_profile: str = 'default',
+                       volume_size: int = None,
+                       volume_iops: int = None,
+                       profile_simulations: bool = False,
+                       profile_interval: float = 0.01,
+                       warm_pool_size: int = None,
+                       submission_interval: float = None,
+                       record_telemetry: bool = False,
+                       telemetry_interval: float = 15,
+                       ami_volume_size: int = None):
     """Generate an aws-parallelcluster ini configuration file.
 
     The configuration process has a few implications for cloud resources. A
     security group is created to enable UDP access on ports 60001-60020 for
     `mosh` access and a shell script is uploaded to the S3 bucket to be used
     as a post-install script on each cluster node.
+
+    The volume settings are taken from `storage_profile`, which is checked
+    against the instance types before any cloud resources are touched. If
+    `profile_simulations` is set, the sampling profiler is also uploaded and
+    the post-install script installs it on each node, and likewise for the
+    utilization telemetry sampler if `record_telemetry` is set. Root volumes
+    are grown to at least `ami_volume_size` (GB), the size of the AMI's root
+    snapshot, since nodes cannot launch with a smaller root volume.
     """
+    storage.validate_storage_profile(storage_profile, master_instance, compute_instance)
+    validate_warm_pool(warm_pool_size, submission_interval)
+    if warm_pool_size is not None and warm_pool_size > int(max_queue_size):
+        message = f"The warm pool size {warm_pool_size} exceeds the max queue size {max_queue_size}."
+        logger.error(message)
+        raise RuntimeError(message)
 
     configuration = get_default_configuration(cluster_name)
 
@@ -79,9 +117,20 @@ def make_configuration(cluster_name: str,
     configuration[f'cluster {cluster_name}']['max_queue_size'] = max_queue_size
     configuration[f'cluster {cluster_name}']['s3_read_write_resource'] = f"arn:aws:s3:::{s3_bucket}*"
 
+    storage.apply_storage_profile(configuration, cluster_name, storage_profile, volume_size, volume_iops)
+    apply_ami_volume_size(configuration, cluster_name, ami_volume_size)
+    apply_warm_pool(configuration, cluster_name, warm_pool_size, submission_interval)
+
     # post_install_path = s3_bucket + "/vaws/post_install.sh"
     post_install_key = "vaws/post_install.sh"
-    upload_to_s3(s3_bucket, post_install_key, _post_install_script)
+    post_install_script = _post_install_script + storage.get_post_install_section(storage_profile)
+    if profile_simulations:
+        upload_to_s3(s3_bucket, profiling.get_profiler_key(), profiling.get_profiler_source())
+        post_install_script += profiling.make_post_install_section(s3_bucket, cluster_name, profile_interval)
+    if record_telemetry:
+        upload_to_s3(s3_bucket, telemetry.get_sampler_key(), telemetry.get_sampler_source())
+        post_install_script += telemetry.make_post_install_section(s3_bucket, cluster_name, telemetry_interval)
+    upload_to_s3(s3_bucket, post_install_key, post_install_script)
     configuration[f'cluster {cluster_name}']['post_install'] = 's3://' + s3_bucket + '/' + post_install_key
 
     configuration[f'vpc {cluster_name}']['vpc_id'] = vpc_id
@@ -96,6 +145,55 @@ def make_configuration(cluster_name: str,
     f.close()
 
 
+def apply_ami_volume_size(configuration: ConfigParser, cluster_name: str, ami_volume_size: int = None):
+    """Grow the master and compute root volume sizes to at least
+    `ami_volume_size` (GB), leaving larger sizes set by a storage profile.
+    """
+    if ami_volume_size is None:
+        return
+
+    cluster_section = configuration[f'cluster {cluster_name}']
+    for key in ['master_root_volume_size', 'compute_root_volume_size']:
+        current_size = int(cluster_section.get(key, _default_root_volume_size_gb))
+        if ami_volume_size > current_size:
+            logger.info(f"Raising {key} from {current_size}GB to the AMI's {ami_volume_size}GB root volume.")
+            cluster_section[key] = str(ami_volume_size)
+
+
+def validate_warm_pool(warm_pool_size: int = None, submission_interval: float = None):
+    """Raise a RuntimeError if the warm pool size or submission interval is
+    negative.
+    """
+    if warm_pool_size is not None and warm_pool_size < 0:
+        message = f"The warm pool size cannot be negative, got {warm_pool_size}."
+        logger.error(message)
+        raise RuntimeError(message)
+    if submission_interval is not None and submission_interval < 0:
+        message = f"The submission interval cannot be negative, got {submission_interval} minutes."
+        logger.error(message)
+        raise RuntimeError(message)
+
+
+def apply_warm_pool(configuration: ConfigParser, cluster_name: str,
+                    warm_pool_size: int = None, submission_interval: float = None):
+    """Keep a floor of `warm_pool_size` compute nodes running and keep idle
+    nodes alive long enough to catch the next batch of jobs when batches
+    arrive every `submission_interval` minutes.
+    """
+    validate_warm_pool(warm_pool_size, submission_interval)
+    if warm_pool_size is not None:
+        configuration[f'cluster {cluster_name}']['initial_queue_size'] = str(warm_pool_size)
+        configuration[f'cluster {cluster_name}']['maintain_initial_size'] = 'true'
+
+    if submission_interval is not None:
+        idletime = math.ceil(submission_interval) + _idletime_margin_minutes
+        if idletime > _max_warm_idletime_minutes:
+            logger.warning(f"Submissions every {submission_interval} minutes are too far apart to keep "
+                           "idle nodes running between them. Keeping the default scale-down time.")
+        else:
+            configuration[f'scaling {cluster_name}']['scaledown_idletime'] = str(idletime)
+
+
 def make_mosh_security_group(region: str, vpc_id: str) -> str:
     """Make an AWS security group that allows UDP access on ports 60001-60020
      and return its ID.
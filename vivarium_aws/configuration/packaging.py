@@ -0,0 +1,239 @@
+import os
+import re
+import shutil
+from collections import defaultdict
+from pathlib import Path, PurePosixPath
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from loguru import logger
+
+
+# Patterns applied beneath any ignore files found in the package root. They
+# keep artifact data and version control metadata out of the image, and can be
+# overridden with negated patterns in a .gitignore or .vawsignore.
+_default_ignore_patterns = ["*.hdf", "*.h5", ".git"]
+
+_ignore_file_names = [".gitignore", ".vawsignore"]
+
+
+class ManifestEntry(NamedTuple):
+    path: str  # posix path relative to the package root
+    size: int  # in bytes
+    is_dir: bool = False
+
+
+class _RuleGroup(NamedTuple):
+    regex: "re.Pattern"
+    negate: bool
+    dir_only: bool
+
+
+def _translate_glob(pattern: str) -> str:
+    """Translate a single gitignore glob into a regular expression matching a
+    posix path relative to the directory holding the ignore file.
+    """
+    anchored = '/' in pattern
+    pattern = pattern.lstrip('/')
+
+    regex = '' if anchored else '(?:.*/)?'
+    i, n = 0, len(pattern)
+    while i < n:
+        if pattern.startswith('**/', i) and (i == 0 or pattern[i - 1] == '/'):
+            regex += '(?:.*/)?'
+            i += 3
+        elif pattern.startswith('**', i) and i + 2 == n and (i == 0 or pattern[i - 1] == '/'):
+            regex += '.*'
+            i += 2
+        elif pattern[i] == '*':
+            regex += '[^/]*'
+            i += 1
+        elif pattern[i] == '?':
+            regex += '[^/]'
+            i += 1
+        elif pattern[i] == '[':
+            end = pattern.find(']', i + 2)
+            if end == -1:
+                regex += re.escape('[')
+                i += 1
+                continue
+            body = pattern[i + 1:end]
+            if body.startswith('!'):
+                body = '^' + body[1:]
+            regex += '[' + body.replace('\\', '\\\\') + ']'
+            i = end + 1
+        elif pattern[i] == '\\' and i + 1 < n:
+            regex += re.escape(pattern[i + 1])
+            i += 2
+        else:
+            regex += re.escape(pattern[i])
+            i += 1
+    return regex
+
+
+class _RuleSet:
+    """The compiled patterns from the ignore files of a single directory.
+
+    Consecutive patterns with the same polarity are merged into a single
+    alternation so that matching costs a handful of regex calls per path
+    rather than one per pattern.
+    """
+
+    def __init__(self, lines: List[str]):
+        self.groups = []
+        pending, key = [], None
+        for line in lines:
+            line = line.rstrip('\n')
+            if not line.strip() or line.startswith('#'):
+                continue
+            line = re.sub(r'(?<!\\)\s+$', '', line)
+            negate = line.startswith('!')
+            if negate:
+                line = line[1:]
+            dir_only = line.endswith('/')
+            line = line.rstrip('/')
+            if not line:
+                continue
+            if (negate, dir_only) != key and pending:
+                self._add_group(pending, *key)
+                pending = []
+            key = (negate, dir_only)
+            pending.append(_translate_glob(line))
+        if pending:
+            self._add_group(pending, *key)
+
+    def _add_group(self, regexes: List[str], negate: bool, dir_only: bool):
+        regex = re.compile('(?:' + '|'.join(regexes) + ')')
+        self.groups.append(_RuleGroup(regex, negate, dir_only))
+
+    def match(self, relative_path: str, is_dir: bool) -> Optional[bool]:
+        """Return True if the path is ignored, False if it is explicitly
+        re-included and None if no pattern applies. The last matching pattern
+        wins, as in git.
+        """
+        for group in reversed(self.groups):
+            if group.dir_only and not is_dir:
+                continue
+            if group.regex.fullmatch(relative_path):
+                return not group.negate
+        return None
+
+
+class IgnoreFilter:
+    """Decide which files under `root` belong in a packaged Vivarium model.
+
+    Patterns are read from every .gitignore and .vawsignore in the tree, with
+    the usual gitignore semantics: deeper ignore files take precedence over
+    shallower ones and the last matching pattern in a file wins. Directories
+    that are ignored are never descended into, so their contents cannot be
+    re-included.
+
+    Paths are posix strings relative to the root, so that checking a file
+    costs a few string slices and regex matches.
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        # {relative directory: [(relative directory, rule set), ...]} from the
+        # deepest directory with ignore files up to the root
+        self._chains: Dict[str, List[Tuple[str, _RuleSet]]] = {}
+
+    def _read_rule_set(self, directory: str) -> Optional[_RuleSet]:
+        lines = list(_default_ignore_patterns) if not directory else []
+        for name in _ignore_file_names:
+            ignore_file = os.path.join(self.root, directory, name)
+            if os.path.isfile(ignore_file):
+                with open(ignore_file, "r") as f:
+                    lines.extend(f.readlines())
+        return _RuleSet(lines) if lines else None
+
+    def _get_chain(self, directory: str) -> List[Tuple[str, _RuleSet]]:
+        if directory not in self._chains:
+            parent_chain = self._get_chain(directory.rpartition('/')[0]) if directory else []
+            rule_set = self._read_rule_set(directory)
+            self._chains[directory] = [(directory, rule_set)] + parent_chain if rule_set else parent_chain
+        return self._chains[directory]
+
+    def is_ignored(self, relative_path: str, is_dir: bool) -> bool:
+        """Return True if the posix path `relative_path`, relative to the
+        root, is excluded.
+
+        Only the path itself is checked; callers walking the tree are
+        expected to skip the contents of ignored directories.
+        """
+        for directory, rule_set in self._get_chain(relative_path.rpartition('/')[0]):
+            decision = rule_set.match(relative_path[len(directory) + 1:] if directory else relative_path, is_dir)
+            if decision is not None:
+                return decision
+        return False
+
+
+def make_manifest(root: Path) -> List[ManifestEntry]:
+    """Walk the package at `root` and list every directory and file that
+    should be packaged, sorted by path. Symbolic links are listed as files
+    and not followed.
+    """
+    ignore = IgnoreFilter(root)
+    manifest = []
+    directories = ['']
+    while directories:
+        directory = directories.pop()
+        with os.scandir(os.path.join(root, directory)) as entries:
+            for entry in entries:
+                relative_path = f"{directory}/{entry.name}" if directory else entry.name
+                is_dir = entry.is_dir(follow_symlinks=False)
+                if ignore.is_ignored(relative_path, is_dir):
+                    continue
+                if is_dir:
+                    directories.append(relative_path)
+                    manifest.append(ManifestEntry(relative_path, 0, is_dir=True))
+                else:
+                    manifest.append(ManifestEntry(relative_path, entry.stat(follow_symlinks=False).st_size))
+    return sorted(manifest)
+
+
+def copy_manifest(manifest: List[ManifestEntry], source: Path, destination: Path):
+    """Copy the directories and files in a manifest from `source` into
+    `destination`.
+    """
+    destination.mkdir(parents=True, exist_ok=True)
+    for entry in manifest:
+        if entry.is_dir:
+            (destination / entry.path).mkdir(parents=True, exist_ok=True)
+        else:
+            (destination / entry.path).parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(source / entry.path, destination / entry.path, follow_symlinks=False)
+
+
+def write_manifest(manifest: List[ManifestEntry], manifest_path: Path):
+    """Write the files in a manifest as tab-separated size (bytes) and path
+    lines.
+    """
+    with open(manifest_path, "w") as f:
+        for entry in manifest:
+            if entry.is_dir:
+                continue
+            f.write(f"{entry.size}\t{entry.path}\n")
+
+
+def log_size_report(manifest: List[ManifestEntry], count: int = 10):
+    """Log the total packaged size and the largest files and directories in a
+    manifest.
+    """
+    manifest = [entry for entry in manifest if not entry.is_dir]
+    directory_sizes = defaultdict(int)
+    for entry in manifest:
+        for parent in PurePosixPath(entry.path).parents:
+            if str(parent) != '.':
+                directory_sizes[str(parent)] += entry.size
+
+    total = sum(entry.size for entry in manifest)
+    logger.info(f"Packaging {len(manifest)} files ({total / 1.e6:.1f}mb).")
+
+    largest_files = sorted(manifest, key=lambda entry: entry.size, reverse=True)[:count]
+    logger.info("Largest files:\n" + '\n'.join(f"\t{entry.size / 1.e6:10.2f}mb  {entry.path}"
+                                               for entry in largest_files))
+
+    largest_directories = sorted(directory_sizes.items(), key=lambda item: item[1], reverse=True)[:count]
+    if largest_directories:
+        logger.info("Largest directories:\n" + '\n'.join(f"\t{size / 1.e6:10.2f}mb  {path}/"
+                                                         for path, size in largest_directories))
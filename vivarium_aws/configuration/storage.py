@@ -0,0 +1,146 @@
+from configparser import ConfigParser
+from typing import NamedTuple
+
+from loguru import logger
+
+from vivarium_aws import instances
+
+
+class StorageProfile(NamedTuple):
+    description: str
+    cluster_settings: dict  # keys added to the cluster section
+    ebs_settings: dict  # an [ebs] section to attach to the master, if any
+    requires_ebs_optimized: bool = False
+    requires_instance_store: bool = False
+    post_install: str = ''  # lines appended to every node's post-install script
+
+
+# aws-parallelcluster 2.6.1 (pinned in setup.py) predates gp3 volumes and
+# volume_throughput, so provisioned performance is expressed with io1.
+_storage_profiles = {
+    'default': StorageProfile(
+        description="aws-parallelcluster defaults.",
+        cluster_settings={},
+        ebs_settings={},
+    ),
+    'provisioned-iops': StorageProfile(
+        description="Larger root volumes, whose gp2 baseline IOPS grow with size, and a "
+                    "provisioned-IOPS io1 volume shared from the master at /shared for "
+                    "collecting results.",
+        cluster_settings={'master_root_volume_size': 100, 'compute_root_volume_size': 50},
+        ebs_settings={'shared_dir': '/shared', 'volume_type': 'io1', 'volume_size': 100,
+                      'volume_iops': 3000},
+        requires_ebs_optimized=True,
+    ),
+    'shared-scratch': StorageProfile(
+        description="A throughput-optimized st1 volume shared from the master at "
+                    "/shared_scratch for large sequential reads and writes.",
+        cluster_settings={'master_root_volume_size': 50},
+        ebs_settings={'shared_dir': '/shared_scratch', 'volume_type': 'st1', 'volume_size': 500},
+    ),
+    'instance-store': StorageProfile(
+        description="Local NVMe instance storage mounted at /scratch on every compute node, "
+                    "with the data artifacts copied onto it so simulations read them locally.",
+        cluster_settings={'ephemeral_dir': '/scratch'},
+        ebs_settings={},
+        requires_instance_store=True,
+        post_install="""
+# Serve data artifacts from instance storage on compute nodes
+. /etc/parallelcluster/cfnconfig
+if [ "$cfn_node_type" == "ComputeFleet" ]; then
+    mkdir -p /scratch/vivarium
+    cp -a /usr/local/share/vivarium/artifacts /scratch/vivarium/artifacts
+    mount --bind /scratch/vivarium/artifacts /usr/local/share/vivarium/artifacts
+fi
+
+""",
+    ),
+}
+
+_minimum_volume_size_gb = {'io1': 4, 'st1': 125}
+_maximum_iops_per_gb = 50
+
+
+def get_storage_profile_names() -> list:
+    """Return the names of the available storage profiles."""
+    return list(_storage_profiles)
+
+
+def validate_storage_profile(profile_name: str, master_instance: str, compute_instance: str):
+    """Raise a RuntimeError if the instance types cannot make use of the
+    storage profile. Instance types missing from the offline catalog are
+    passed with a warning.
+    """
+    profile = _storage_profiles[profile_name]
+
+    def lookup(instance_name):
+        try:
+            return instances.get_instance_type(instance_name)
+        except RuntimeError:
+            logger.warning(f"Cannot validate storage profile {profile_name} against {instance_name}.")
+            return None
+
+    master, compute = lookup(master_instance), lookup(compute_instance)
+
+    if profile.requires_ebs_optimized and master is not None and not master.ebs_optimized:
+        message = (f"The {profile_name} storage profile provisions EBS performance that the "
+                   f"master instance {master_instance} cannot reach because it is not "
+                   "EBS-optimized. Choose a t3, m5, c5 or r5 master.")
+        logger.error(message)
+        raise RuntimeError(message)
+
+    if profile.requires_instance_store and compute is not None and not compute.instance_storage_gb:
+        message = (f"The {profile_name} storage profile requires a compute instance with NVMe "
+                   f"instance storage, which {compute_instance} lacks. Choose a 'd' variant "
+                   "such as c5d.large or m5d.large.")
+        logger.error(message)
+        raise RuntimeError(message)
+
+
+def get_post_install_section(profile_name: str) -> str:
+    """Return the post-install script lines a storage profile needs, if any."""
+    return _storage_profiles[profile_name].post_install
+
+
+def apply_storage_profile(configuration: ConfigParser, cluster_name: str, profile_name: str,
+                          volume_size: int = None, volume_iops: int = None):
+    """Write the cluster settings and ebs section for a storage profile into an
+    aws-parallelcluster configuration. `volume_size` (GB) and `volume_iops`
+    override the profile's shared volume.
+    """
+    profile = _storage_profiles[profile_name]
+    logger.info(f"Using the {profile_name} storage profile: {profile.description}")
+
+    for key, value in profile.cluster_settings.items():
+        configuration[f'cluster {cluster_name}'][key] = str(value)
+
+    if not profile.ebs_settings:
+        if volume_size is not None or volume_iops is not None:
+            logger.warning(f"The {profile_name} storage profile has no shared volume to size.")
+        return
+
+    ebs_settings = dict(profile.ebs_settings)
+    if volume_size is not None:
+        ebs_settings['volume_size'] = volume_size
+    if volume_iops is not None:
+        if ebs_settings['volume_type'] != 'io1':
+            message = f"Volume IOPS can only be set on io1 volumes, not {ebs_settings['volume_type']}."
+            logger.error(message)
+            raise RuntimeError(message)
+        ebs_settings['volume_iops'] = volume_iops
+
+    minimum_size = _minimum_volume_size_gb[ebs_settings['volume_type']]
+    if ebs_settings['volume_size'] < minimum_size:
+        message = (f"{ebs_settings['volume_type']} volumes must be at least {minimum_size}GB, "
+                   f"not {ebs_settings['volume_size']}GB.")
+        logger.error(message)
+        raise RuntimeError(message)
+    if 'volume_iops' in ebs_settings and ebs_settings['volume_iops'] > _maximum_iops_per_gb * ebs_settings['volume_size']:
+        message = (f"io1 volumes support at most {_maximum_iops_per_gb} IOPS per GB. Increase the "
+                   f"volume size or lower the IOPS.")
+        logger.error(message)
+        raise RuntimeError(message)
+
+    ebs_name = profile_name.replace('-', '_')
+    configuration[f'cluster {cluster_name}']['ebs_settings'] = ebs_name
+    configuration[f'ebs {ebs_name}'] = {key: str(value) for key, value in ebs_settings.items()}
@@ -0,0 +1,99 @@
+import boto3
+from botocore.exceptions import ClientError
+from loguru import logger
+
+
+# The minimum size configured by aws-parallelcluster is stashed in this tag
+# while the floor is raised so that it can be restored afterwards.
+_floor_tag = 'vaws:configured-min-size'
+
+
+def get_compute_fleet(region: str, cluster_name: str) -> dict:
+    """Return the description of a cluster's compute fleet auto scaling group
+    else raise a RuntimeError if it does not exist.
+
+    aws-parallelcluster 2.x creates it in the CloudFormation stack
+    `parallelcluster-<cluster_name>`.
+    """
+    client = boto3.client('autoscaling', region_name=region)
+    stack_name = f"parallelcluster-{cluster_name}"
+    try:
+        for page in client.get_paginator('describe_auto_scaling_groups').paginate():
+            for group in page['AutoScalingGroups']:
+                tags = {tag['Key']: tag['Value'] for tag in group['Tags']}
+                if tags.get('aws:cloudformation:stack-name') == stack_name:
+                    return group
+    except ClientError as e:
+        logger.error(e)
+        raise
+
+    message = f"No compute fleet found for cluster {cluster_name}. Is it running in {region}?"
+    logger.error(message)
+    raise RuntimeError(message)
+
+
+def warm_compute_fleet(region: str, cluster_name: str, nodes: int):
+    """Raise the floor of a cluster's compute fleet to `nodes` and start that
+    many nodes now, ahead of a batch of jobs. The floor never drops below the
+    minimum configured by aws-parallelcluster.
+    """
+    if nodes < 1:
+        message = f"Cannot warm {nodes} nodes, give at least one."
+        logger.error(message)
+        raise RuntimeError(message)
+
+    group = get_compute_fleet(region, cluster_name)
+    if nodes > group['MaxSize']:
+        message = f"Cannot warm {nodes} nodes, the cluster's max queue size is {group['MaxSize']}."
+        logger.error(message)
+        raise RuntimeError(message)
+
+    tags = {tag['Key']: tag['Value'] for tag in group['Tags']}
+    configured_floor = int(tags.get(_floor_tag, group['MinSize']))
+    floor = max(nodes, configured_floor)
+    if floor > nodes:
+        logger.warning(f"The configured compute fleet floor of {cluster_name} is {configured_floor} "
+                       f"nodes, which is kept.")
+
+    client = boto3.client('autoscaling', region_name=region)
+    try:
+        if _floor_tag not in tags:
+            client.create_or_update_tags(Tags=[{
+                'ResourceId': group['AutoScalingGroupName'],
+                'ResourceType': 'auto-scaling-group',
+                'Key': _floor_tag,
+                'Value': str(group['MinSize']),
+                'PropagateAtLaunch': False,
+            }])
+        client.update_auto_scaling_group(AutoScalingGroupName=group['AutoScalingGroupName'],
+                                         MinSize=floor,
+                                         DesiredCapacity=max(floor, group['DesiredCapacity']))
+    except ClientError as e:
+        logger.error(e)
+        raise
+    logger.info(f"Set the compute fleet floor of {cluster_name} to {floor} nodes.")
+
+
+def release_compute_fleet(region: str, cluster_name: str):
+    """Restore the floor of a cluster's compute fleet to its configured
+    minimum. Nodes above it scale down once they have been idle.
+    """
+    group = get_compute_fleet(region, cluster_name)
+    tags = {tag['Key']: tag['Value'] for tag in group['Tags']}
+    if _floor_tag not in tags:
+        logger.info(f"The compute fleet floor of {cluster_name} is not raised.")
+        return
+
+    client = boto3.client('autoscaling', region_name=region)
+    floor = int(tags[_floor_tag])
+    try:
+        client.update_auto_scaling_group(AutoScalingGroupName=group['AutoScalingGroupName'], MinSize=floor)
+        client.delete_tags(Tags=[{
+            'ResourceId': group['AutoScalingGroupName'],
+            'ResourceType': 'auto-scaling-group',
+            'Key': _floor_tag,
+        }])
+    except ClientError as e:
+        logger.error(e)
+        raise
+    logger.info(f"Restored the compute fleet floor of {cluster_name} to {floor} nodes.")
@@ -0,0 +1,71 @@
+from typing import NamedTuple
+
+from loguru import logger
+
+
+class InstanceType(NamedTuple):
+    name: str
+    vcpus: int
+    memory_mib: int
+    hourly_cost: float  # on-demand USD, us-east-1 linux
+    network_gbps: float  # baseline, not burst
+    ebs_throughput_mbps: float  # baseline MB/s to EBS
+    ebs_optimized: bool = True
+    instance_storage_gb: int = 0  # local NVMe instance store
+    baseline_cpu: float = 1.0  # fraction of each vCPU sustainable without burst credits
+
+
+# A snapshot of `aws ec2 describe-instance-types` and on-demand pricing for
+# the instance families vaws is typically used with, so that configuration
+# and planning can run without EC2 access.
+_catalog = {instance.name: instance for instance in [
+    InstanceType("t2.nano", 1, 512, 0.0058, 0.032, 4, ebs_optimized=False, baseline_cpu=0.05),
+    InstanceType("t2.micro", 1, 1024, 0.0116, 0.064, 8, ebs_optimized=False, baseline_cpu=0.1),
+    InstanceType("t2.small", 1, 2048, 0.023, 0.128, 16, ebs_optimized=False, baseline_cpu=0.2),
+    InstanceType("t2.medium", 2, 4096, 0.0464, 0.256, 32, ebs_optimized=False, baseline_cpu=0.2),
+    InstanceType("t2.large", 2, 8192, 0.0928, 0.512, 64, ebs_optimized=False, baseline_cpu=0.3),
+    InstanceType("t2.xlarge", 4, 16384, 0.1856, 0.75, 94, ebs_optimized=False, baseline_cpu=0.225),
+    InstanceType("t2.2xlarge", 8, 32768, 0.3712, 1.0, 125, ebs_optimized=False, baseline_cpu=0.17),
+    InstanceType("t3.micro", 2, 1024, 0.0104, 0.064, 10.9, baseline_cpu=0.1),
+    InstanceType("t3.small", 2, 2048, 0.0208, 0.128, 21.75, baseline_cpu=0.2),
+    InstanceType("t3.medium", 2, 4096, 0.0416, 0.256, 43.4, baseline_cpu=0.2),
+    InstanceType("t3.large", 2, 8192, 0.0832, 0.512, 86.9, baseline_cpu=0.3),
+    InstanceType("t3.xlarge", 4, 16384, 0.1664, 1.024, 86.9, baseline_cpu=0.4),
+    InstanceType("t3.2xlarge", 8, 32768, 0.3328, 2.048, 86.9, baseline_cpu=0.4),
+    InstanceType("m5.large", 2, 8192, 0.096, 0.75, 81.25),
+    InstanceType("m5.xlarge", 4, 16384, 0.192, 1.25, 143.75),
+    InstanceType("m5.2xlarge", 8, 32768, 0.384, 2.5, 287.5),
+    InstanceType("m5.4xlarge", 16, 65536, 0.768, 5.0, 593.75),
+    InstanceType("c5.large", 2, 4096, 0.085, 0.75, 81.25),
+    InstanceType("c5.xlarge", 4, 8192, 0.17, 1.25, 143.75),
+    InstanceType("c5.2xlarge", 8, 16384, 0.34, 2.5, 287.5),
+    InstanceType("c5.4xlarge", 16, 32768, 0.68, 5.0, 593.75),
+    InstanceType("r5.large", 2, 16384, 0.126, 0.75, 81.25),
+    InstanceType("r5.xlarge", 4, 32768, 0.252, 1.25, 143.75),
+    InstanceType("r5.2xlarge", 8, 65536, 0.504, 2.5, 287.5),
+    InstanceType("m5d.large", 2, 8192, 0.113, 0.75, 81.25, instance_storage_gb=75),
+    InstanceType("m5d.xlarge", 4, 16384, 0.226, 1.25, 143.75, instance_storage_gb=150),
+    InstanceType("m5d.2xlarge", 8, 32768, 0.452, 2.5, 287.5, instance_storage_gb=300),
+    InstanceType("c5d.large", 2, 4096, 0.096, 0.75, 81.25, instance_storage_gb=50),
+    InstanceType("c5d.xlarge", 4, 8192, 0.192, 1.25, 143.75, instance_storage_gb=100),
+    InstanceType("c5d.2xlarge", 8, 16384, 0.384, 2.5, 287.5, instance_storage_gb=200),
+    InstanceType("r5d.large", 2, 16384, 0.144, 0.75, 81.25, instance_storage_gb=75),
+    InstanceType("r5d.xlarge", 4, 32768, 0.288, 1.25, 143.75, instance_storage_gb=150),
+]}
+
+
+def get_instance_type(name: str) -> InstanceType:
+    """Look up an instance type in the offline catalog else raise a
+    RuntimeError.
+    """
+    if name not in _catalog:
+        message = (f"Instance type {name} is not in the vaws instance catalog. "
+                   f"Known types are: {', '.join(_catalog)}.")
+        logger.error(message)
+        raise RuntimeError(message)
+    return _catalog[name]
+
+
+def get_instance_types() -> list:
+    """Return every instance type in the offline catalog."""
+    return list(_catalog.values())
@@ -0,0 +1,182 @@
+"""A low-overhead sampling profiler installed on cluster nodes by the vaws
+post-install script.
+
+This module is copied into the simulation environment's site-packages as
+`vaws_profiler` and imported by a .pth file at interpreter start, so it must
+only depend on the standard library and run on the environment's Python 3.6.
+Nothing happens unless the node has a profiler configuration file. When
+enabled, a daemon thread periodically samples the main thread's stack and
+aggregates collapsed stacks by simulation branch, flushing compressed
+profiles to a spool directory that the node syncs to S3.
+"""
+import atexit
+import gzip
+import json
+import os
+import socket
+import sys
+import threading
+import time
+import uuid
+
+_config_path = os.environ.get('VAWS_PROFILER_CONFIG', '/etc/vaws/profiler.conf')
+
+_default_config = {
+    'interval': '0.01',  # seconds between samples
+    'flush_interval': '30',  # seconds between writes to the spool directory
+    'spool': '/var/spool/vaws/profiles',
+    # vivarium_cluster_tools keeps a job's branch under this key of this local
+    'branch_variable': 'job_parameters',
+    'branch_key': 'branch_configuration',
+}
+
+_sampler = None
+
+
+def read_config(path=_config_path):
+    """Read a key=value profiler configuration file, or return None if it
+    does not exist.
+    """
+    if not os.path.exists(path):
+        return None
+    config = dict(_default_config)
+    with open(path) as f:
+        for line in f:
+            if '=' in line and not line.startswith('#'):
+                key, value = line.split('=', 1)
+                config[key.strip()] = value.strip()
+    return config
+
+
+class Sampler(threading.Thread):
+    """Sample the stack of the thread `target` every `interval` seconds."""
+
+    def __init__(self, target, config):
+        super().__init__(name='vaws-profiler', daemon=True)
+        self.target = target
+        self.interval = float(config['interval'])
+        self.flush_interval = float(config['flush_interval'])
+        self.spool = config['spool']
+        self.branch_variable = config['branch_variable']
+        self.branch_key = config['branch_key']
+        self.stacks = {}  # {branch: {collapsed stack: samples}}
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        # Profiles are named uniquely so that pids reused across the forked
+        # workers of a long-lived node never overwrite each other.
+        self.name = '{}-{}-{}'.format(socket.gethostname(), os.getpid(), uuid.uuid4().hex)
+        self._parameters = None
+        self._branch = 'unknown'
+
+    def run(self):
+        last_flush = time.time()
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.target)
+            if frame is not None:
+                self.record(frame)
+            del frame
+            if time.time() - last_flush > self.flush_interval:
+                self.flush()
+                last_flush = time.time()
+
+    def record(self, frame):
+        names = []
+        branch = 'unknown'
+        while frame is not None:
+            code = frame.f_code
+            names.append('{} ({}:{})'.format(code.co_name, code.co_filename, code.co_firstlineno))
+            if branch == 'unknown' and self.branch_variable in code.co_varnames:
+                branch = self.get_branch(frame)
+            frame = frame.f_back
+        stack = ';'.join(reversed(names))
+        with self.lock:
+            branch_stacks = self.stacks.setdefault(branch, {})
+            branch_stacks[stack] = branch_stacks.get(stack, 0) + 1
+
+    def get_branch(self, frame):
+        # Serializing the branch is the costly part, so the label is cached
+        # for the parameters object of the running job. Frames and ids are
+        # reused from one job to the next, so the parameters object itself
+        # is held and compared; it is small, unlike the frame's other locals.
+        parameters = frame.f_locals.get(self.branch_variable)
+        if parameters is None:
+            return 'unknown'
+        if parameters is not self._parameters:
+            try:
+                branch = parameters.get(self.branch_key, parameters)
+            except AttributeError:
+                branch = parameters
+            self._parameters = parameters
+            self._branch = json.dumps(branch, sort_keys=True, default=str)
+        return self._branch
+
+    def flush(self):
+        with self.lock:
+            if not self.stacks:
+                return
+            profile = {
+                'host': socket.gethostname(),
+                'pid': os.getpid(),
+                'argv': sys.argv,
+                'interval': self.interval,
+                'stacks': self.stacks,
+            }
+            contents = json.dumps(profile).encode('utf-8')
+        path = os.path.join(self.spool, '{}.json.gz'.format(self.name))
+        try:
+            with gzip.open(path + '.tmp', 'wb') as f:
+                f.write(contents)
+            os.replace(path + '.tmp', path)  # never leave a partial profile to be synced
+        except OSError:
+            pass
+
+    def stop(self):
+        self.stopped.set()
+        self.flush()
+
+
+def start(config):
+    global _sampler
+    _sampler = Sampler(threading.get_ident(), config)
+    _sampler.start()
+
+
+def stop():
+    if _sampler is not None:
+        _sampler.stop()
+
+
+def _after_fork():
+    # Threads do not survive a fork, and task queue workers such as rq run
+    # each simulation in a forked child that leaves with os._exit.
+    config = read_config()
+    if config is not None:
+        start(config)
+
+
+def _patch_fork():
+    original_fork, original_exit = os.fork, os._exit
+
+    def fork():
+        pid = original_fork()
+        if pid == 0:
+            _after_fork()
+        return pid
+
+    def _exit(status):
+        stop()
+        original_exit(status)
+
+    os.fork, os._exit = fork, _exit
+
+
+def install():
+    """Start profiling this process and any processes it forks if the node
+    has a profiler configuration file.
+    """
+    config = read_config()
+    if config is None or _sampler is not None:
+        return
+    start(config)
+    atexit.register(stop)
+    _patch_fork()
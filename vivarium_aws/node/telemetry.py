@@ -0,0 +1,248 @@
+"""A lightweight utilization sampler run as a service on cluster nodes by the
+vaws post-install script.
+
+It must only depend on the standard library and run on the node's system
+Python 3. Every interval it records CPU, memory, disk and network usage from
+/proc along with the node's SGE slot occupancy, and rewrites the current
+hour's samples as a gzipped CSV in a spool directory that the node syncs to
+S3.
+"""
+import csv
+import gzip
+import io
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+import uuid
+
+_config_path = os.environ.get('VAWS_TELEMETRY_CONFIG', '/etc/vaws/telemetry.conf')
+
+_default_config = {
+    'interval': '15',  # seconds between samples
+    'chunk': '3600',  # seconds of samples per file
+    'spool': '/var/spool/vaws/telemetry',
+    'qstat': '/opt/sge/bin/lx-amd64/qstat',
+    'proc': '/proc',
+    'qstat_timeout': '10',  # seconds
+    'metadata_url': 'http://169.254.169.254/latest',
+}
+
+COLUMNS = ['timestamp', 'vcpus', 'cpu_busy', 'cpu_iowait', 'memory_used_mib', 'memory_total_mib',
+           'max_rss_mib', 'disk_read_mbps', 'disk_write_mbps', 'net_rx_mbps', 'net_tx_mbps',
+           'slots_used', 'slots_total']
+
+
+def read_config(path=_config_path):
+    """Read a key=value telemetry configuration file over the defaults."""
+
+    config = dict(_default_config)
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                if '=' in line and not line.startswith('#'):
+                    key, value = line.split('=', 1)
+                    config[key.strip()] = value.strip()
+    return config
+
+
+def read_vcpus(proc):
+    """Return the number of CPUs listed in stat."""
+
+    with open(os.path.join(proc, 'stat')) as f:
+        return sum(1 for line in f if line.startswith('cpu') and line[3].isdigit())
+
+
+def read_cpu_times(proc):
+    """Return (total, idle, iowait) jiffies summed over all CPUs."""
+
+    with open(os.path.join(proc, 'stat')) as f:
+        fields = [int(v) for v in f.readline().split()[1:]]
+    return sum(fields[:8]), fields[3], fields[4]
+
+
+def read_memory_mib(proc):
+    """Return (used, total) memory in MiB."""
+
+    values = {}
+    with open(os.path.join(proc, 'meminfo')) as f:
+        for line in f:
+            key, value = line.split(':', 1)
+            values[key] = int(value.split()[0])  # in kB
+    return (values['MemTotal'] - values['MemAvailable']) / 1024, values['MemTotal'] / 1024
+
+
+def read_max_rss_mib(proc):
+    """Return the resident memory of the largest process in MiB."""
+
+    max_rss = 0
+    for pid in os.listdir(proc):
+        if not pid.isdigit():
+            continue
+        try:
+            with open(os.path.join(proc, pid, 'status')) as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        max_rss = max(max_rss, int(line.split()[1]))
+                        break
+        except OSError:
+            pass  # the process exited
+    return max_rss / 1024
+
+
+def _is_whole_disk(name):
+    if name.startswith(('loop', 'ram')):
+        return False
+    if name.startswith('nvme'):
+        return 'p' not in name[4:]  # nvme0n1 is a disk, nvme0n1p1 a partition
+    return not name[-1].isdigit()  # xvda is a disk, xvda1 a partition
+
+
+def read_disk_bytes(proc):
+    """Return (read, written) bytes summed over whole disks."""
+
+    read = written = 0
+    with open(os.path.join(proc, 'diskstats')) as f:
+        for line in f:
+            fields = line.split()
+            if not _is_whole_disk(fields[2]):
+                continue
+            read += int(fields[5]) * 512
+            written += int(fields[9]) * 512
+    return read, written
+
+
+def read_network_bytes(proc):
+    """Return (received, transmitted) bytes summed over non-loopback
+    interfaces.
+    """
+    received = transmitted = 0
+    with open(os.path.join(proc, 'net', 'dev')) as f:
+        for line in f.readlines()[2:]:
+            name, values = line.split(':', 1)
+            if name.strip() == 'lo':
+                continue
+            values = values.split()
+            received += int(values[0])
+            transmitted += int(values[8])
+    return received, transmitted
+
+
+def read_slots(qstat, hostname, timeout):
+    """Return (used, total) SGE slots on this host, or blanks if the queue
+    cannot be queried within `timeout` seconds.
+    """
+    try:
+        output = subprocess.check_output([qstat, '-f', '-q', 'all.q@{}'.format(hostname)],
+                                         stderr=subprocess.DEVNULL, universal_newlines=True,
+                                         timeout=timeout)
+    except (OSError, subprocess.CalledProcessError, subprocess.TimeoutExpired):
+        return '', ''
+    for line in output.splitlines():
+        if line.startswith('all.q@'):
+            _, used, total = line.split()[2].split('/')  # reserved/used/total
+            return int(used), int(total)
+    return '', ''
+
+
+def read_instance_id(metadata_url):
+    """Return this node's EC2 instance id from the instance metadata service,
+    trying IMDSv2 then IMDSv1, or a random id if it cannot be reached.
+    """
+    headers = {}
+    try:
+        request = urllib.request.Request(metadata_url + '/api/token', method='PUT',
+                                         headers={'X-aws-ec2-metadata-token-ttl-seconds': '60'})
+        with urllib.request.urlopen(request, timeout=1) as response:
+            headers['X-aws-ec2-metadata-token'] = response.read().decode()
+    except OSError:
+        pass
+    try:
+        request = urllib.request.Request(metadata_url + '/meta-data/instance-id', headers=headers)
+        with urllib.request.urlopen(request, timeout=1) as response:
+            return response.read().decode().strip()
+    except OSError:
+        return uuid.uuid4().hex
+
+
+class Sampler:
+    """Turn cumulative /proc counters into per-interval utilization rows."""
+
+    def __init__(self, config):
+        self.proc = config['proc']
+        self.qstat = config['qstat']
+        self.qstat_timeout = float(config['qstat_timeout'])
+        self.hostname = socket.gethostname().split('.')[0]
+        # Hostnames come from private IPs, which later nodes can reuse, so
+        # files are named for the instance as well.
+        self.name = '{}.{}'.format(self.hostname, read_instance_id(config['metadata_url']))
+        self.vcpus = read_vcpus(self.proc)
+        self.previous = None
+
+    def read_counters(self):
+        return (time.time(), read_cpu_times(self.proc), read_disk_bytes(self.proc),
+                read_network_bytes(self.proc))
+
+    def sample(self):
+        """Return a row of utilization since the last call, or None on the
+        first call.
+        """
+        current = self.read_counters()
+        previous, self.previous = self.previous, current
+        if previous is None:
+            return None
+
+        (now, (total, idle, iowait), (read, written), (received, transmitted)) = current
+        (then, (total_0, idle_0, iowait_0), (read_0, written_0), (received_0, transmitted_0)) = previous
+        elapsed = now - then
+        jiffies = max(total - total_0, 1)
+        memory_used, memory_total = read_memory_mib(self.proc)
+        slots_used, slots_total = read_slots(self.qstat, self.hostname, self.qstat_timeout)
+
+        return [
+            int(now), self.vcpus,
+            round(1 - (idle - idle_0 + iowait - iowait_0) / jiffies, 3),
+            round((iowait - iowait_0) / jiffies, 3),
+            round(memory_used), round(memory_total), round(read_max_rss_mib(self.proc)),
+            round((read - read_0) / elapsed / 1.e6, 2), round((written - written_0) / elapsed / 1.e6, 2),
+            round((received - received_0) / elapsed / 1.e6, 2),
+            round((transmitted - transmitted_0) / elapsed / 1.e6, 2),
+            slots_used, slots_total,
+        ]
+
+
+def write_chunk(spool, name, start, rows):
+    """Atomically rewrite the gzipped CSV of samples for the chunk beginning
+    at `start` on the node `name`.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    writer.writerows(rows)
+    path = os.path.join(spool, '{}-{}.csv.gz'.format(name, start))
+    with gzip.open(path + '.tmp', 'wt') as f:
+        f.write(buffer.getvalue())
+    os.replace(path + '.tmp', path)
+
+
+def main(config):
+    interval, chunk = float(config['interval']), int(config['chunk'])
+    os.makedirs(config['spool'], exist_ok=True)
+    sampler = Sampler(config)
+    sampler.sample()
+
+    start, rows = None, []
+    while True:
+        time.sleep(interval)
+        row = sampler.sample()
+        chunk_start = row[0] - row[0] % chunk
+        if chunk_start != start:
+            start, rows = chunk_start, []
+        rows.append(row)
+        write_chunk(config['spool'], sampler.name, start, rows)
+
+
+if __name__ == '__main__':
+    main(read_config(sys.argv[1] if len(sys.argv) > 1 else _config_path))
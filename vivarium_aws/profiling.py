@@ -0,0 +1,123 @@
+import gzip
+import json
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, List, NamedTuple
+
+from vivarium_aws import utilities
+from vivarium_aws.node import profiler as node_profiler
+
+
+_profile_prefix = "vaws/profiles"
+_profiler_key = "vaws/vaws_profiler.py"
+
+
+class HotFunction(NamedTuple):
+    function: str
+    self_samples: int  # samples with the function at the top of the stack
+    total_samples: int  # samples with the function anywhere on the stack
+
+
+def get_profile_prefix(cluster_name: str) -> str:
+    """Return the S3 key prefix that a cluster's nodes sync profiles to."""
+    return f"{_profile_prefix}/{cluster_name}"
+
+
+def get_profiler_key() -> str:
+    """Return the S3 key the node-side profiler is uploaded to."""
+    return _profiler_key
+
+
+def get_profiler_source() -> str:
+    """Return the source of the node-side sampling profiler."""
+    return Path(node_profiler.__file__).read_text()
+
+
+def make_post_install_section(s3_bucket: str, cluster_name: str, interval: float) -> str:
+    """Return the post-install script lines that install the sampling profiler
+    into the simulation environment and sync its profiles to S3 every minute.
+    """
+    sync_section = utilities.make_spool_sync_section('vaws-profiler', '/var/spool/vaws/profiles',
+                                                     f"s3://{s3_bucket}/{get_profile_prefix(cluster_name)}/")
+    return f"""
+# Sampling profiler for simulation processes, see `vaws profile report`
+SITE_PACKAGES=$(/home/ubuntu/miniconda3/envs/simulation/bin/python -c "import site; print(site.getsitepackages()[0])")
+aws s3 cp s3://{s3_bucket}/{_profiler_key} $SITE_PACKAGES/vaws_profiler.py
+echo "import vaws_profiler; vaws_profiler.install()" > $SITE_PACKAGES/vaws_profiler.pth
+mkdir -p /etc/vaws /var/spool/vaws/profiles
+chmod 1777 /var/spool/vaws/profiles
+echo "interval={interval}" > /etc/vaws/profiler.conf
+{sync_section}
+"""
+
+
+def download_profiles(s3_bucket: str, cluster_name: str, destination: Path,
+                      endpoint_url: str = None) -> List[Path]:
+    """Download every profile a cluster has synced to S3 into `destination`
+    and return their paths.
+    """
+    return utilities.download_s3_prefix(s3_bucket, get_profile_prefix(cluster_name), destination, endpoint_url)
+
+
+def merge_profiles(paths: List[Path]) -> Dict[str, Counter]:
+    """Sum the collapsed stack samples of many profiles, by branch."""
+
+    merged = defaultdict(Counter)
+    for path in paths:
+        with gzip.open(path, 'rt') as f:
+            profile = json.load(f)
+        for branch, stacks in profile['stacks'].items():
+            merged[branch].update(stacks)
+    return dict(merged)
+
+
+def combine_branches(merged: Dict[str, Counter]) -> Counter:
+    """Sum the collapsed stack samples of every branch."""
+
+    combined = Counter()
+    for stacks in merged.values():
+        combined.update(stacks)
+    return combined
+
+
+def get_hot_functions(stacks: Counter, count: int = 20) -> List[HotFunction]:
+    """Rank the functions in a set of collapsed stacks by self samples."""
+
+    self_samples, total_samples = Counter(), Counter()
+    for stack, samples in stacks.items():
+        frames = stack.split(';')
+        self_samples[frames[-1]] += samples
+        for function in set(frames):  # recursion only counts once
+            total_samples[function] += samples
+
+    ranked = sorted(total_samples, key=lambda function: (self_samples[function], total_samples[function]),
+                    reverse=True)
+    return [HotFunction(function, self_samples[function], total_samples[function]) for function in ranked[:count]]
+
+
+def write_report(merged: Dict[str, Counter], output_path: Path, count: int = 20):
+    """Write collapsed stack files for flamegraph tools and hot function
+    tables to `output_path`, for all branches together and for each branch.
+
+    Branch labels are indexed in `branches.json`, and each `.folded` file is
+    in the format read by flamegraph.pl and speedscope.
+    """
+    output_path.mkdir(parents=True, exist_ok=True)
+
+    branches = {'all': 'all branches'}
+    reports = {'all': combine_branches(merged)}
+    for i, branch in enumerate(sorted(merged)):
+        branches[f'branch_{i:03d}'] = branch
+        reports[f'branch_{i:03d}'] = merged[branch]
+
+    for name, stacks in reports.items():
+        with open(output_path / f"{name}.folded", "w") as f:
+            for stack, samples in sorted(stacks.items()):
+                f.write(f"{stack} {samples}\n")
+        with open(output_path / f"{name}_hot_functions.tsv", "w") as f:
+            f.write("self_samples\ttotal_samples\tfunction\n")
+            for hot in get_hot_functions(stacks, count):
+                f.write(f"{hot.self_samples}\t{hot.total_samples}\t{hot.function}\n")
+
+    with open(output_path / "branches.json", "w") as f:
+        f.write(json.dumps(branches, indent=2))
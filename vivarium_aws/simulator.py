@@ -0,0 +1,274 @@
+import heapq
+import itertools
+import math
+import random
+from configparser import ConfigParser
+from pathlib import Path
+from typing import Callable, List, NamedTuple
+
+from loguru import logger
+
+from vivarium_aws import instances
+
+
+_polling_interval = 1.  # minutes between jobwatcher and nodewatcher checks
+
+_NODE_READY, _JOB_DONE, _POLL = range(3)
+
+
+class ClusterSettings(NamedTuple):
+    compute_instance_type: str
+    master_instance_type: str
+    initial_queue_size: int
+    max_queue_size: int
+    maintain_initial_size: bool
+    scaledown_idletime: float  # minutes
+    slots_per_node: int
+
+
+class SimulationResult(NamedTuple):
+    makespan: float  # hours
+    node_hours: float
+    utilization: float  # fraction of compute slot-hours spent running jobs
+    peak_nodes: float
+    cost: float  # USD, compute nodes plus the master for the makespan
+
+
+class _Node:
+    __slots__ = ('launched', 'ready', 'busy', 'idle_since', 'terminated')
+
+    def __init__(self, launched: float):
+        self.launched = launched
+        self.ready = False
+        self.busy = 0
+        self.idle_since = None
+        self.terminated = None
+
+
+def read_cluster_settings(cluster_config: Path) -> ClusterSettings:
+    """Read the autoscaling-relevant settings out of an aws-parallelcluster
+    ini file, filling in pcluster defaults for anything unset.
+    """
+    config = ConfigParser()
+    config.read(cluster_config)
+
+    cluster_name = config['global']['cluster_template']
+    cluster = config[f'cluster {cluster_name}']
+
+    scaling_section = f"scaling {cluster['scaling_settings']}" if 'scaling_settings' in cluster else 'scaling'
+    scaling = config[scaling_section] if config.has_section(scaling_section) else {}
+
+    compute_instance_type = cluster.get('compute_instance_type', 't2.micro')
+    return ClusterSettings(
+        compute_instance_type=compute_instance_type,
+        master_instance_type=cluster.get('master_instance_type', 't2.micro'),
+        initial_queue_size=int(cluster.get('initial_queue_size', 2)),
+        max_queue_size=int(cluster.get('max_queue_size', 10)),
+        maintain_initial_size=cluster.get('maintain_initial_size', 'false').lower() == 'true',
+        scaledown_idletime=float(scaling.get('scaledown_idletime', 10)),
+        slots_per_node=instances.get_instance_type(compute_instance_type).vcpus,
+    )
+
+
+def parse_runtime_distribution(spec: str) -> Callable[[random.Random], float]:
+    """Parse a job runtime distribution in minutes from a string of the form
+    `name:param[,param]`. Supported forms are `fixed:MINUTES`,
+    `uniform:LOW,HIGH`, `normal:MEAN,SD`, `lognormal:MEAN,SD` and
+    `exponential:MEAN`. Samples are floored at one second.
+    """
+    try:
+        name, params = spec.split(':')
+        params = [float(p) for p in params.split(',')]
+    except ValueError:
+        raise ValueError(f"Could not parse runtime distribution '{spec}'.")
+
+    if name == 'fixed' and len(params) == 1 and params[0] > 0:
+        sampler = lambda rng: params[0]
+    elif name == 'uniform' and len(params) == 2 and 0 <= params[0] <= params[1] and params[1] > 0:
+        sampler = lambda rng: rng.uniform(*params)
+    elif name == 'normal' and len(params) == 2 and params[0] > 0 and params[1] >= 0:
+        sampler = lambda rng: rng.gauss(*params)
+    elif name == 'lognormal' and len(params) == 2 and params[0] > 0 and params[1] >= 0:
+        mean, sd = params
+        sigma = math.sqrt(math.log(1 + (sd / mean) ** 2))
+        mu = math.log(mean) - sigma ** 2 / 2
+        sampler = lambda rng: rng.lognormvariate(mu, sigma)
+    elif name == 'exponential' and len(params) == 1 and params[0] > 0:
+        sampler = lambda rng: rng.expovariate(1 / params[0])
+    elif name in ['fixed', 'uniform', 'normal', 'lognormal', 'exponential']:
+        raise ValueError(f"Invalid parameters for runtime distribution '{spec}'. Means and bounds "
+                         "must be positive and spreads non-negative.")
+    else:
+        raise ValueError(f"Unknown runtime distribution '{spec}'.")
+
+    return lambda rng: max(sampler(rng), 1 / 60)
+
+
+def simulate(settings: ClusterSettings, num_jobs: int, runtime: Callable[[random.Random], float],
+             boot_time: float = 6., seed: int = None) -> SimulationResult:
+    """Simulate running `num_jobs` jobs, all submitted at once to a cluster
+    that has just come up with its initial nodes running. `boot_time` is the
+    minutes between the jobwatcher requesting a node and SGE scheduling on it.
+
+    The model follows the aws-parallelcluster 2.x autoscaling daemons. A
+    jobwatcher on the master polls the queue once a minute and grows the
+    compute fleet to cover pending slots, up to `max_queue_size`. A
+    nodewatcher on each compute node terminates it once it has been idle for
+    `scaledown_idletime` minutes and nothing is pending, never shrinking the
+    fleet below `initial_queue_size` if `maintain_initial_size` is set. SGE
+    packs jobs onto the fullest node with a free slot, one slot per vCPU.
+    """
+    if settings.max_queue_size < 1:
+        raise ValueError("A cluster needs a max_queue_size of at least 1 to run jobs.")
+    if settings.scaledown_idletime < 0:
+        raise ValueError("The scaledown_idletime cannot be negative.")
+    if num_jobs < 1:
+        raise ValueError("At least one job is needed to simulate.")
+    if boot_time < 0:
+        raise ValueError("The boot time cannot be negative.")
+
+    rng = random.Random(seed)
+    slots = settings.slots_per_node
+    floor = settings.initial_queue_size if settings.maintain_initial_size else 0
+
+    events = []
+    sequence = itertools.count()
+
+    def schedule(time, kind, node=None):
+        heapq.heappush(events, (time, next(sequence), kind, node))
+
+    nodes = []
+    # Ready nodes with a free slot, bucketed by busy slots. Each bucket is an
+    # insertion-ordered dict, so idle nodes in bucket 0 are ordered by the time
+    # they went idle.
+    open_nodes = [{} for _ in range(slots)]
+    for _ in range(min(settings.initial_queue_size, settings.max_queue_size)):
+        node = _Node(0.)
+        node.ready, node.idle_since = True, 0.
+        nodes.append(node)
+        open_nodes[0][node] = None
+
+    active = len(nodes)  # launched and not yet terminated
+    free_slots = active * slots  # on active nodes, including those booting
+    pending = num_jobs
+    completed = 0
+    busy_slot_time = 0.
+    peak_nodes = active
+    makespan = 0.
+
+    def dispatch(now):
+        nonlocal pending, free_slots, busy_slot_time
+        busy = slots - 1
+        while pending and busy >= 0:
+            if not open_nodes[busy]:
+                busy -= 1
+                continue
+            node = next(iter(open_nodes[busy]))
+            del open_nodes[busy][node]
+            while pending and node.busy < slots:
+                duration = runtime(rng)
+                node.busy += 1
+                pending -= 1
+                free_slots -= 1
+                busy_slot_time += duration
+                schedule(now + duration, _JOB_DONE, node)
+            node.idle_since = None
+            if node.busy < slots:
+                open_nodes[node.busy][node] = None
+
+    dispatch(0.)
+    schedule(_polling_interval, _POLL)
+
+    while events:
+        now, _, kind, node = heapq.heappop(events)
+
+        if kind == _NODE_READY:
+            node.ready, node.idle_since = True, now
+            open_nodes[0][node] = None
+            dispatch(now)
+
+        elif kind == _JOB_DONE:
+            if node.busy < slots:
+                del open_nodes[node.busy][node]
+            node.busy -= 1
+            free_slots += 1
+            completed += 1
+            if completed == num_jobs:
+                makespan = now
+            if node.busy == 0:
+                node.idle_since = now
+            open_nodes[node.busy][node] = None
+            dispatch(now)
+
+        else:
+            # jobwatcher: cover pending work not already absorbed by free or booting slots
+            shortfall = pending - free_slots
+            if shortfall > 0:
+                for _ in range(min(math.ceil(shortfall / slots), settings.max_queue_size - active)):
+                    new_node = _Node(now)
+                    nodes.append(new_node)
+                    schedule(now + boot_time, _NODE_READY, new_node)
+                    active += 1
+                    free_slots += slots
+                peak_nodes = max(peak_nodes, active)
+
+            # nodewatcher: idle nodes shut themselves down when nothing is queued
+            if not pending:
+                for n in list(open_nodes[0]):
+                    if active <= floor or now - n.idle_since < settings.scaledown_idletime:
+                        break
+                    n.terminated = now
+                    del open_nodes[0][n]
+                    active -= 1
+                    free_slots -= slots
+
+            if completed < num_jobs or active > floor:
+                schedule(now + _polling_interval, _POLL)
+
+    node_minutes = sum((n.terminated if n.terminated is not None else makespan) - n.launched for n in nodes)
+    compute = instances.get_instance_type(settings.compute_instance_type)
+    master = instances.get_instance_type(settings.master_instance_type)
+
+    return SimulationResult(
+        makespan=makespan / 60,
+        node_hours=node_minutes / 60,
+        utilization=busy_slot_time / (node_minutes * slots) if node_minutes else 0.,
+        peak_nodes=peak_nodes,
+        cost=node_minutes / 60 * compute.hourly_cost + makespan / 60 * master.hourly_cost,
+    )
+
+
+def simulate_expected(settings: ClusterSettings, num_jobs: int, runtime: Callable[[random.Random], float],
+                      boot_time: float = 6., replications: int = 20, seed: int = 0) -> SimulationResult:
+    """Average the results of `replications` independent simulations."""
+
+    if replications < 1:
+        raise ValueError("At least one replication is needed to simulate.")
+    results = [simulate(settings, num_jobs, runtime, boot_time, seed=seed + i) for i in range(replications)]
+    return SimulationResult(*[sum(values) / replications for values in zip(*results)])
+
+
+def sweep(settings: ClusterSettings, num_jobs: int, runtime: Callable[[random.Random], float],
+          boot_time: float = 6., replications: int = 20, seed: int = 0,
+          max_queue_sizes: List[int] = None, scaledown_idletimes: List[float] = None,
+          compute_instance_types: List[str] = None) -> List[tuple]:
+    """Simulate every combination of the given overrides to `settings` and
+    return (settings, result) pairs. Unspecified overrides keep the value
+    from `settings`.
+    """
+    grid = itertools.product(max_queue_sizes or [settings.max_queue_size],
+                             scaledown_idletimes or [settings.scaledown_idletime],
+                             compute_instance_types or [settings.compute_instance_type])
+
+    results = []
+    for max_queue_size, scaledown_idletime, compute_instance_type in grid:
+        candidate = settings._replace(
+            max_queue_size=max_queue_size,
+            scaledown_idletime=scaledown_idletime,
+            compute_instance_type=compute_instance_type,
+            slots_per_node=instances.get_instance_type(compute_instance_type).vcpus,
+        )
+        results.append((candidate, simulate_expected(candidate, num_jobs, runtime, boot_time,
+                                                     replications, seed)))
+    logger.info(f"Simulated {len(results)} cluster configurations.")
+    return results
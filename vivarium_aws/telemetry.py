@@ -0,0 +1,206 @@
+import csv
+import gzip
+import math
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, NamedTuple
+
+from loguru import logger
+
+from vivarium_aws import instances, utilities
+from vivarium_aws.node import telemetry as node_telemetry
+
+
+_telemetry_prefix = "vaws/telemetry"
+_sampler_key = "vaws/vaws_telemetry.py"
+
+_reserved_memory_mib = 512  # left for the OS and SGE on each node
+_cpu_bound_threshold = 0.85
+_memory_bound_threshold = 0.9
+_io_bound_iowait = 0.2
+
+
+class NodeSummary(NamedTuple):
+    host: str
+    samples: int
+    vcpus: int
+    memory_total_mib: float
+    cpu_busy_p95: float
+    cpu_iowait_mean: float
+    memory_used_p95_mib: float
+    disk_mbps_p95: float
+    network_mbps_p95: float
+    slots_used_mean: float
+    slots_total: int
+
+
+class JobDemand(NamedTuple):
+    vcpus: float  # per running job, 95th percentile
+    memory_mib: float  # per running job, 95th percentile
+    iowait: float  # mean fraction of CPU time waiting on I/O while jobs run
+    bottleneck: str
+
+
+class Recommendation(NamedTuple):
+    instance_type: str
+    slots: int
+    hourly_cost: float
+    cost_per_slot_hour: float
+
+
+def get_telemetry_prefix(cluster_name: str) -> str:
+    """Return the S3 key prefix that a cluster's nodes sync telemetry to."""
+    return f"{_telemetry_prefix}/{cluster_name}"
+
+
+def get_sampler_key() -> str:
+    """Return the S3 key the node-side telemetry sampler is uploaded to."""
+    return _sampler_key
+
+
+def get_sampler_source() -> str:
+    """Return the source of the node-side telemetry sampler."""
+    return Path(node_telemetry.__file__).read_text()
+
+
+def make_post_install_section(s3_bucket: str, cluster_name: str, interval: float) -> str:
+    """Return the post-install script lines that run the telemetry sampler as
+    a service and sync its samples to S3 every minute.
+    """
+    sync_section = utilities.make_spool_sync_section('vaws-telemetry', '/var/spool/vaws/telemetry',
+                                                     f"s3://{s3_bucket}/{get_telemetry_prefix(cluster_name)}/")
+    return f"""
+# Utilization telemetry sampler, see `vaws telemetry summarize`
+mkdir -p /opt/vaws /etc/vaws /var/spool/vaws/telemetry
+aws s3 cp s3://{s3_bucket}/{_sampler_key} /opt/vaws/vaws_telemetry.py
+echo "interval={interval}" > /etc/vaws/telemetry.conf
+cat > /etc/systemd/system/vaws-telemetry.service <<EOF
+[Unit]
+Description=vaws utilization telemetry sampler
+
+[Service]
+Environment=SGE_ROOT=/opt/sge SGE_CELL=default
+ExecStart=/usr/bin/python3 /opt/vaws/vaws_telemetry.py /etc/vaws/telemetry.conf
+Restart=always
+
+[Install]
+WantedBy=multi-user.target
+EOF
+systemctl daemon-reload
+systemctl enable --now vaws-telemetry
+{sync_section}
+"""
+
+
+def download_telemetry(s3_bucket: str, cluster_name: str, destination: Path,
+                       endpoint_url: str = None) -> List[Path]:
+    """Download every telemetry file a cluster has synced to S3 into
+    `destination` and return their paths.
+    """
+    return utilities.download_s3_prefix(s3_bucket, get_telemetry_prefix(cluster_name), destination, endpoint_url)
+
+
+def load_samples(paths: List[Path]) -> Dict[str, List[dict]]:
+    """Read telemetry files into time-ordered samples by node, labelled
+    `<hostname>.<instance id>`. Slot counts are None where SGE could not be
+    queried.
+    """
+    samples = defaultdict(list)
+    for path in paths:
+        host = path.name.rsplit('-', 1)[0]
+        with gzip.open(path, 'rt') as f:
+            for row in csv.DictReader(f):
+                samples[host].append({key: float(value) if value else None for key, value in row.items()})
+    return {host: sorted(rows, key=lambda row: row['timestamp']) for host, rows in samples.items()}
+
+
+def _percentile(values: list, q: float) -> float:
+    if not values:
+        return 0.
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def _mean(values: list) -> float:
+    return sum(values) / len(values) if values else 0.
+
+
+def summarize_nodes(samples: Dict[str, List[dict]]) -> List[NodeSummary]:
+    """Summarize the utilization of each node."""
+
+    summaries = []
+    for host, rows in sorted(samples.items()):
+        slots_used = [row['slots_used'] for row in rows if row['slots_used'] is not None]
+        slots_total = [row['slots_total'] for row in rows if row['slots_total'] is not None]
+        summaries.append(NodeSummary(
+            host=host,
+            samples=len(rows),
+            vcpus=int(rows[-1]['vcpus']),
+            memory_total_mib=rows[-1]['memory_total_mib'],
+            cpu_busy_p95=_percentile([row['cpu_busy'] for row in rows], 0.95),
+            cpu_iowait_mean=_mean([row['cpu_iowait'] for row in rows]),
+            memory_used_p95_mib=_percentile([row['memory_used_mib'] for row in rows], 0.95),
+            disk_mbps_p95=_percentile([row['disk_read_mbps'] + row['disk_write_mbps'] for row in rows], 0.95),
+            network_mbps_p95=_percentile([row['net_rx_mbps'] + row['net_tx_mbps'] for row in rows], 0.95),
+            slots_used_mean=_mean(slots_used),
+            slots_total=int(max(slots_total)) if slots_total else 0,
+        ))
+    return summaries
+
+
+def estimate_job_demand(samples: Dict[str, List[dict]]) -> JobDemand:
+    """Estimate the CPU and memory a single running job needs from samples
+    taken while jobs were running, and name what limits the nodes.
+    """
+    vcpus_per_job, memory_per_job, iowait, cpu_busy, memory_fraction = [], [], [], [], []
+    for rows in samples.values():
+        idle_memory = [row['memory_used_mib'] for row in rows if row['slots_used'] == 0]
+        baseline = _percentile(idle_memory, 0.5) if idle_memory else _reserved_memory_mib
+        for row in rows:
+            if not row['slots_used']:
+                continue
+            vcpus_per_job.append(row['cpu_busy'] * row['vcpus'] / row['slots_used'])
+            memory_per_job.append(max(row['max_rss_mib'],
+                                      (row['memory_used_mib'] - baseline) / row['slots_used']))
+            iowait.append(row['cpu_iowait'])
+            if row['slots_used'] == row['slots_total']:
+                cpu_busy.append(row['cpu_busy'])
+            memory_fraction.append(row['memory_used_mib'] / row['memory_total_mib'])
+
+    if not vcpus_per_job:
+        message = ("No samples were taken while jobs were running. Was SGE reachable from "
+                   "the telemetry sampler?")
+        logger.error(message)
+        raise RuntimeError(message)
+
+    if _percentile(memory_fraction, 0.95) >= _memory_bound_threshold:
+        bottleneck = 'memory'
+    elif _mean(iowait) >= _io_bound_iowait:
+        bottleneck = 'io'
+    elif _percentile(cpu_busy, 0.5) >= _cpu_bound_threshold:
+        bottleneck = 'cpu'
+    else:
+        bottleneck = 'none'
+
+    return JobDemand(vcpus=_percentile(vcpus_per_job, 0.95),
+                     memory_mib=_percentile(memory_per_job, 0.95),
+                     iowait=_mean(iowait),
+                     bottleneck=bottleneck)
+
+
+def recommend_instances(demand: JobDemand, count: int = 5) -> List[Recommendation]:
+    """Rank catalog instance types by cost per job slot, where each instance
+    runs as many jobs as its vCPUs and memory allow, and at most one per vCPU
+    as SGE does. Burstable instances are only credited with the CPU they can
+    sustain once their burst credits run out.
+    """
+    recommendations = []
+    for instance in instances.get_instance_types():
+        cpu_slots = instance.vcpus * instance.baseline_cpu / max(demand.vcpus, 0.1)
+        memory_slots = (instance.memory_mib - _reserved_memory_mib) / max(demand.memory_mib, 1)
+        slots = math.floor(min(cpu_slots, memory_slots, instance.vcpus))
+        if slots < 1:
+            continue
+        recommendations.append(Recommendation(instance.name, slots, instance.hourly_cost,
+                                              instance.hourly_cost / slots))
+    return sorted(recommendations, key=lambda r: (r.cost_per_slot_hour, r.hourly_cost))[:count]
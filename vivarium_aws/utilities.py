@@ -1,5 +1,6 @@
 import shutil
 import random
+from pathlib import Path
 
 import boto3
 from botocore.exceptions import ClientError
@@ -35,9 +36,10 @@ def ensure_aws_credentials_exist():
     logger.info(f"AWS credentials found! ({credentials.method})")
 
 
-def ensure_ami_exists(region: str, ami_id: str):
-    """Raise a runtime error if and AMI with id ami_id does not exist."""
-
+def ensure_ami_exists(region: str, ami_id: str) -> dict:
+    """Return the description of the AMI with id ami_id else raise a
+    RuntimeError if it does not exist.
+    """
     client = boto3.client('ec2', region_name=region)
     try:
         response = client.describe_images(Filters=[{'Name': 'image-id', 'Values': [ami_id]}])
@@ -46,11 +48,23 @@ def ensure_ami_exists(region: str, ami_id: str):
         raise
 
     if len(response['Images']) == 0:
-        message = ("AMI with id {ami_id} not found. Please check "
-                           "your EC2 console and look for typos.")
+        message = (f"AMI with id {ami_id} not found. Please check "
+                   "your EC2 console and look for typos.")
         logger.error(message)
         raise RuntimeError(message)
 
+    return response['Images'][0]
+
+
+def get_root_volume_size(image: dict) -> int:
+    """Return the size in GB of an AMI's root volume snapshot, or None if the
+    description does not include it.
+    """
+    for mapping in image.get('BlockDeviceMappings', []):
+        if mapping.get('DeviceName') == image.get('RootDeviceName') and 'Ebs' in mapping:
+            return mapping['Ebs'].get('VolumeSize')
+    return None
+
 
 def get_default_region() -> str:
     """Get the default region specified in the user's credentials."""
@@ -148,3 +162,48 @@ def prompt_for_ec2_keypair(region: str) -> str:
         print(f"Please type a number between 1 and {num_key_pairs}.\n")
 
     return response['KeyPairs'][selected_pair_idx]['KeyName']
+
+
+def make_spool_sync_section(name: str, spool: str, s3_uri: str) -> str:
+    """Return post-install script lines that install a cron job syncing the
+    spool directory `spool` to `s3_uri` every minute, skipping files that are
+    still being written.
+
+    Cron runs with a minimal PATH, so the aws cli is located when the
+    post-install script runs and the PATH is widened as well.
+    """
+    return (f"cat > /etc/cron.d/{name} <<EOF\n"
+            f"PATH=/usr/local/bin:/usr/bin:/bin\n"
+            f"* * * * * root $(command -v aws) s3 sync --quiet --exclude '*.tmp' {spool} {s3_uri}\n"
+            f"EOF\n")
+
+
+def download_s3_prefix(bucket: str, prefix: str, destination: Path, endpoint_url: str = None) -> list:
+    """Download every object in an S3 bucket under `prefix` into
+    `destination`, preserving the rest of each key as a relative path, and
+    return their paths. Raise a RuntimeError if there are none.
+
+    `endpoint_url` points boto3 at an S3-compatible service other than AWS,
+    such as a local fake.
+    """
+    client = boto3.client('s3', endpoint_url=endpoint_url)
+    prefix = prefix.rstrip('/') + '/'
+
+    paths = []
+    try:
+        for page in client.get_paginator('list_objects_v2').paginate(Bucket=bucket, Prefix=prefix):
+            for item in page.get('Contents', []):
+                path = destination / item['Key'][len(prefix):]
+                path.parent.mkdir(parents=True, exist_ok=True)
+                client.download_file(bucket, item['Key'], str(path))
+                paths.append(path)
+    except ClientError as e:
+        logger.error(e)
+        raise
+
+    if not paths:
+        message = f"No objects found under s3://{bucket}/{prefix}."
+        logger.error(message)
+        raise RuntimeError(message)
+    logger.info(f"Downloaded {len(paths)} objects from s3://{bucket}/{prefix}.")
+    return paths